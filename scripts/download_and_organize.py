@@ -60,8 +60,10 @@ def setup():
 
 def sess():
     s=requests.Session()
-    s.mount("https://",HTTPAdapter(max_retries=Retry(total=3,backoff_factor=1,status_forcelist=[429,500,502,503,504]),pool_maxsize=20))
-    s.mount("http://",HTTPAdapter(max_retries=Retry(total=2,backoff_factor=1,status_forcelist=[500,502,503]),pool_maxsize=10))
+    # One keep-alive pool shared by every dl_* source (amortizes TLS handshakes)
+    a=HTTPAdapter(pool_connections=32,pool_maxsize=32,
+        max_retries=Retry(total=3,backoff_factor=0.3,status_forcelist=[429,500,502,503,504]))
+    s.mount("https://",a); s.mount("http://",a)
     s.headers.update({"User-Agent":"IR-DEF/5.0","Accept-Encoding":"gzip, deflate"})
     t=os.environ.get("GITHUB_TOKEN","")
     if t: s.headers["Authorization"]=f"Bearer {t}"
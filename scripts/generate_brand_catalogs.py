@@ -7,6 +7,7 @@ back to the Drive root as _BRAND_CATALOGS/.
 """
 import os, sys, json, subprocess, textwrap
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 RCLONE_REMOTE = "gdrive2:IR_DEF_REPOSITORY"
@@ -20,9 +21,21 @@ def rclone(args, capture=False):
         return r.stdout, r.returncode
     subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
+def fast_rmtree(root):
+    """rmtree with the unlinks fanned out over threads (os.unlink releases the GIL)."""
+    paths, dirs = [], []
+    for rt, ds, fs in os.walk(root, topdown=False):
+        paths.extend(os.path.join(rt, f) for f in fs)
+        dirs.append(rt)
+    with ThreadPoolExecutor(32) as ex:
+        list(ex.map(os.unlink, paths))
+    for d in dirs:
+        os.rmdir(d)
+
 def get_folder_structure():
     print("📡 Scanning Drive folder structure...")
-    out, rc = rclone(["lsjson", RCLONE_REMOTE, "-R", "--files-only", "--no-modtime", "--no-mimetype"], capture=True)
+    out, rc = rclone(["lsjson", RCLONE_REMOTE, "-R", "--files-only", "--no-modtime", "--no-mimetype",
+                      "--fast-list", "--drive-skip-gdocs"], capture=True)
     if rc != 0 or not out.strip():
         print(f"❌ Failed (rc={rc})")
         return {}
@@ -118,8 +131,7 @@ def main():
         return
 
     if TEMP_DIR.exists():
-        import shutil
-        shutil.rmtree(TEMP_DIR)
+        fast_rmtree(TEMP_DIR)
     TEMP_DIR.mkdir(parents=True)
 
     total_brands = len(brands)
@@ -169,8 +181,7 @@ def main():
     rclone(["copy", str(TEMP_DIR), CATALOGS_REMOTE])
 
     print("\n🧹 Cleaning up...")
-    import shutil
-    shutil.rmtree(TEMP_DIR)
+    fast_rmtree(TEMP_DIR)
     print(f"🎉 {total_brands} brand catalogs + 1 master catalog generated and uploaded!")
 
 if __name__ == "__main__":
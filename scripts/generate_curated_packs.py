@@ -4,13 +4,15 @@ ToneHub Pro - Curated Rig Pack Generator
 Scans the entire Drive repository, identifies tone files by keyword,
 and uploads curated ZIP packs to _CURATED_RIGS/ on Drive.
 """
-import os, sys, json, shutil, subprocess, random
+import os, sys, json, subprocess, random, zipfile
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 
 RCLONE_REMOTE = "gdrive2:IR_DEF_REPOSITORY"
 PACKS_REMOTE = f"{RCLONE_REMOTE}/_CURATED_RIGS"
 TEMP_DIR = Path("/tmp/curated_packs")
 MAX_FILES_PER_PACK = 120
+STORED_EXT = (".wav", ".nam")  # already dense; deflating them burns CPU for ~0 gain
 
 PACKS = {
     "01_Modern_Metal_Starter_Pack": {
@@ -38,6 +40,8 @@ PACKS = {
         "desc": "Every iconic pedal captured: Tube Screamers, Klon, RAT, Big Muff, and beyond."
     },
 }
+for info in PACKS.values():
+    info["keywords_lc"] = tuple(k.casefold() for k in info["keywords"])
 
 def rclone(args, capture=False):
     cmd = ["rclone"] + args
@@ -47,9 +51,29 @@ def rclone(args, capture=False):
     else:
         subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
 
+def fast_rmtree(root):
+    """rmtree with the unlinks fanned out over threads (os.unlink releases the GIL)."""
+    paths, dirs = [], []
+    for rt, ds, fs in os.walk(root, topdown=False):
+        paths.extend(os.path.join(rt, f) for f in fs)
+        dirs.append(rt)
+    with ThreadPoolExecutor(32) as ex:
+        list(ex.map(os.unlink, paths))
+    for d in dirs:
+        os.rmdir(d)
+
+def make_zip(pack_dir, zip_path):
+    with zipfile.ZipFile(zip_path, "w", allowZip64=True) as zf:
+        for f in sorted(pack_dir.rglob("*")):
+            if not f.is_file():
+                continue
+            ct = zipfile.ZIP_STORED if f.suffix.lower() in STORED_EXT else zipfile.ZIP_DEFLATED
+            zf.write(f, f.relative_to(pack_dir), compress_type=ct)
+
 def get_all_files():
     print("📡 Scanning entire Drive repository...")
-    out, rc = rclone(["lsjson", RCLONE_REMOTE, "-R", "--files-only", "--no-modtime", "--no-mimetype"], capture=True)
+    out, rc = rclone(["lsjson", RCLONE_REMOTE, "-R", "--files-only", "--no-modtime", "--no-mimetype",
+                      "--fast-list", "--drive-skip-gdocs"], capture=True)
     if rc != 0 or not out.strip():
         print(f"❌ Failed to list files (rc={rc}). Check rclone config.")
         return []
@@ -68,11 +92,12 @@ def create_packs():
         return
 
     if TEMP_DIR.exists():
-        shutil.rmtree(TEMP_DIR)
+        fast_rmtree(TEMP_DIR)
     TEMP_DIR.mkdir(parents=True)
 
     for pack_name, info in PACKS.items():
         keywords = info["keywords"]
+        keywords_lc = info["keywords_lc"]
         desc = info["desc"]
         print(f"\n{'='*60}")
         print(f"📦 Generating: {pack_name}")
@@ -87,13 +112,12 @@ def create_packs():
         for fp in files:
             if "_CURATED_RIGS" in fp:
                 continue
-            low = fp.lower()
-            if any(k.lower() in low for k in keywords):
+            low = fp.casefold()
+            if any(k in low for k in keywords_lc):
                 matched.append(fp)
 
-        random.seed(42)
         if len(matched) > MAX_FILES_PER_PACK:
-            matched = random.sample(matched, MAX_FILES_PER_PACK)
+            matched = random.Random(42).sample(matched, MAX_FILES_PER_PACK)
 
         print(f"   Selected {len(matched)} files")
 
@@ -120,14 +144,13 @@ def create_packs():
             f.write("Part of the ToneHub Pro 35,000+ Tone Collection.\n")
 
         # Create ZIP
-        zip_base = TEMP_DIR / pack_name
+        zip_file = TEMP_DIR / f"{pack_name}.zip"
         print(f"   📁 Zipping...")
-        shutil.make_archive(str(zip_base), "zip", pack_dir)
+        make_zip(pack_dir, zip_file)
 
         # Upload
-        zip_file = f"{zip_base}.zip"
         print(f"   ☁️  Uploading to Drive...")
-        rclone(["copy", zip_file, PACKS_REMOTE])
+        rclone(["copy", str(zip_file), PACKS_REMOTE])
         print(f"   ✅ {pack_name}.zip uploaded!")
 
     # Also upload individual pack folders (unzipped) for browsing
@@ -135,7 +158,7 @@ def create_packs():
     rclone(["copy", str(TEMP_DIR), PACKS_REMOTE, "--exclude", "*.zip"])
 
     print("\n🧹 Cleaning up...")
-    shutil.rmtree(TEMP_DIR)
+    fast_rmtree(TEMP_DIR)
     print("\n🎉 All Curated Rig Packs generated and uploaded to _CURATED_RIGS!")
 
 if __name__ == "__main__":
@@ -4,102 +4,120 @@ ToneHub Pro - Drive README Generator
 Creates a premium README.txt file in the root of the Google Drive
 repository so customers immediately understand what they have.
 """
-import os, json, subprocess
-from pathlib import Path
+import json, subprocess
+from collections import Counter
 from datetime import datetime
+try:
+    import ijson
+    LSJSON_ERRORS = (ValueError, ijson.common.JSONError)  # empty or cut-off listing
+except ImportError:
+    ijson = None  # Fallback: rclone prints one JSON object per line
+    LSJSON_ERRORS = (ValueError,)
 
 RCLONE_REMOTE = "gdrive2:IR_DEF_REPOSITORY"
-TEMP_DIR = Path("/tmp/drive_readme")
+README_NAME = "README_TONEHUB_PRO.txt"
+BANNER = r"""
+████████╗ ██████╗ ███╗   ██╗███████╗██╗  ██╗██╗   ██╗██████╗
+╚══██╔══╝██╔═══██╗████╗  ██║██╔════╝██║  ██║██║   ██║██╔══██╗
+   ██║   ██║   ██║██╔██╗ ██║█████╗  ███████║██║   ██║██████╔╝
+   ██║   ██║   ██║██║╚██╗██║██╔══╝  ██╔══██║██║   ██║██╔══██╗
+   ██║   ╚██████╔╝██║ ╚████║███████╗██║  ██║╚██████╔╝██████╔╝
+   ╚═╝    ╚═════╝ ╚═╝  ╚═══╝╚══════╝╚═╝  ╚═╝ ╚═════╝ ╚═════╝
+                    P  R  O
+"""
 
-def rclone(args, capture=False):
-    cmd = ["rclone"] + args
-    if capture:
-        r = subprocess.run(cmd, capture_output=True, text=True, encoding="utf-8")
-        return r.stdout, r.returncode
-    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+def iter_lsjson(stream):
+    """Yield rclone lsjson records one at a time instead of buffering the whole listing."""
+    if ijson is not None:
+        yield from ijson.items(stream, "item")
+        return
+    for line in stream:
+        line = line.strip().rstrip(b",")
+        if line and line not in (b"[", b"]"):
+            yield json.loads(line)
 
 def main():
     print("📡 Scanning Drive for statistics...")
-    out, rc = rclone(["lsjson", RCLONE_REMOTE, "-R", "--files-only", "--no-modtime", "--no-mimetype"], capture=True)
-    if rc != 0 or not out.strip():
+    n_wavs = n_nams = total_size = records = 0
+    brands = set()
+    brand_counts = Counter()
+    proc = subprocess.Popen(["rclone", "lsjson", RCLONE_REMOTE, "-R", "--files-only", "--no-modtime", "--no-mimetype",
+                             "--fast-list", "--drive-skip-gdocs"],
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        for f in iter_lsjson(proc.stdout):
+            records += 1
+            path = f["Path"]
+            total_size += f.get("Size", 0)
+            low = path.lower()
+            is_wav = low.endswith(".wav")
+            is_nam = not is_wav and low.endswith(".nam")
+            n_wavs += is_wav
+            n_nams += is_nam
+            head, sep, _ = path.partition("/")
+            if sep and not head.startswith("_"):
+                brands.add(head)
+                if is_wav or is_nam:
+                    brand_counts[head] += 1
+    except LSJSON_ERRORS:
+        records = 0  # rclone failed or the listing was cut off
+    finally:
+        proc.stdout.close()
+        rc = proc.wait()
+    if rc != 0 or not records:
         print("❌ Could not read Drive.")
         return
-
-    data = json.loads(out)
-    wavs = [f for f in data if f["Path"].lower().endswith(".wav")]
-    nams = [f for f in data if f["Path"].lower().endswith(".nam")]
-    total = len(wavs) + len(nams)
-    total_size = sum(f.get("Size", 0) for f in data)
-
-    # Get brands
-    brands = set()
-    for f in data:
-        parts = f["Path"].split("/")
-        if len(parts) >= 2 and not parts[0].startswith("_"):
-            brands.add(parts[0])
+    total = n_wavs + n_nams
 
     def fmt(b):
         for u in ["B", "KB", "MB", "GB", "TB"]:
             if b < 1024: return f"{b:.1f} {u}"
             b /= 1024
 
-    TEMP_DIR.mkdir(parents=True, exist_ok=True)
-
-    readme = TEMP_DIR / "README_TONEHUB_PRO.txt"
-    with open(readme, "w", encoding="utf-8") as f:
-        f.write(r"""
-████████╗ ██████╗ ███╗   ██╗███████╗██╗  ██╗██╗   ██╗██████╗
-╚══██╔══╝██╔═══██╗████╗  ██║██╔════╝██║  ██║██║   ██║██╔══██╗
-   ██║   ██║   ██║██╔██╗ ██║█████╗  ███████║██║   ██║██████╔╝
-   ██║   ██║   ██║██║╚██╗██║██╔══╝  ██╔══██║██║   ██║██╔══██╗
-   ██║   ╚██████╔╝██║ ╚████║███████╗██║  ██║╚██████╔╝██████╔╝
-   ╚═╝    ╚═════╝ ╚═╝  ╚═══╝╚══════╝╚═╝  ╚═╝ ╚═════╝ ╚═════╝
-                    P  R  O
-""")
-        f.write("=" * 60 + "\n")
-        f.write("  THE ULTIMATE TONE COLLECTION\n")
-        f.write("=" * 60 + "\n\n")
-        f.write(f"  Last Updated: {datetime.now().strftime('%B %d, %Y')}\n\n")
-        f.write(f"  📊 Repository Statistics:\n")
-        f.write(f"  ─────────────────────────────────────\n")
-        f.write(f"  Total Tone Files:    {total:,}\n")
-        f.write(f"  Impulse Responses:   {len(wavs):,} (.wav)\n")
-        f.write(f"  Neural Amp Models:   {len(nams):,} (.nam)\n")
-        f.write(f"  Total Brands:        {len(brands)}\n")
-        f.write(f"  Total Size:          {fmt(total_size)}\n\n")
-        f.write(f"  📂 Folder Structure:\n")
-        f.write(f"  ─────────────────────────────────────\n")
-        f.write(f"  /[Brand Name]/          → Master vault organized by brand\n")
-        f.write(f"  /_CURATED_RIGS/         → Ready-to-play themed ZIP packs\n")
-        f.write(f"  /_BRAND_CATALOGS/       → Full file listings per brand\n")
-        f.write(f"  /README_TONEHUB_PRO.txt → This file\n\n")
-        f.write(f"  🎸 How to Use:\n")
-        f.write(f"  ─────────────────────────────────────\n")
-        f.write(f"  1. QUICK START: Go to _CURATED_RIGS/ and download\n")
-        f.write(f"     a themed pack (e.g., Modern_Metal_Starter_Pack.zip)\n\n")
-        f.write(f"  2. BROWSE BY BRAND: Navigate brand folders to find\n")
-        f.write(f"     specific amp/cab captures.\n\n")
-        f.write(f"  3. SEARCH: Use Google Drive's search bar to find\n")
-        f.write(f"     any specific model instantly.\n\n")
-        f.write(f"  4. IRs (.wav): Load into any amp sim or modeler\n")
-        f.write(f"     that supports impulse responses.\n\n")
-        f.write(f"  5. NAMs (.nam): Load into Neural Amp Modeler plugin.\n\n")
-        f.write(f"  🏷️ Brand Index ({len(brands)} brands):\n")
-        f.write(f"  ─────────────────────────────────────\n")
-        for b in sorted(brands):
-            count = len([x for x in data if x["Path"].startswith(b + "/") and x["Path"].lower().endswith((".wav", ".nam"))])
-            f.write(f"  • {b:<30} {count:>5} files\n")
-        f.write(f"\n" + "=" * 60 + "\n")
-        f.write(f"  ToneHub Pro — Premium Tone Ecosystem\n")
-        f.write(f"  All content is 100% real captures from verified sources.\n")
-        f.write(f"=" * 60 + "\n")
+    bar = "=" * 60 + "\n"
+    rule = "  ─────────────────────────────────────\n"
+    parts = [
+        BANNER, bar,
+        "  THE ULTIMATE TONE COLLECTION\n",
+        bar, "\n",
+        f"  Last Updated: {datetime.now().strftime('%B %d, %Y')}\n\n",
+        "  📊 Repository Statistics:\n", rule,
+        f"  Total Tone Files:    {total:,}\n",
+        f"  Impulse Responses:   {n_wavs:,} (.wav)\n",
+        f"  Neural Amp Models:   {n_nams:,} (.nam)\n",
+        f"  Total Brands:        {len(brands)}\n",
+        f"  Total Size:          {fmt(total_size)}\n\n",
+        "  📂 Folder Structure:\n", rule,
+        "  /[Brand Name]/          → Master vault organized by brand\n",
+        "  /_CURATED_RIGS/         → Ready-to-play themed ZIP packs\n",
+        "  /_BRAND_CATALOGS/       → Full file listings per brand\n",
+        "  /README_TONEHUB_PRO.txt → This file\n\n",
+        "  🎸 How to Use:\n", rule,
+        "  1. QUICK START: Go to _CURATED_RIGS/ and download\n",
+        "     a themed pack (e.g., Modern_Metal_Starter_Pack.zip)\n\n",
+        "  2. BROWSE BY BRAND: Navigate brand folders to find\n",
+        "     specific amp/cab captures.\n\n",
+        "  3. SEARCH: Use Google Drive's search bar to find\n",
+        "     any specific model instantly.\n\n",
+        "  4. IRs (.wav): Load into any amp sim or modeler\n",
+        "     that supports impulse responses.\n\n",
+        "  5. NAMs (.nam): Load into Neural Amp Modeler plugin.\n\n",
+        f"  🏷️ Brand Index ({len(brands)} brands):\n", rule,
+    ]
+    parts.extend(f"  • {b:<30} {brand_counts[b]:>5} files\n" for b in sorted(brands))
+    parts += ["\n", bar,
+              "  ToneHub Pro — Premium Tone Ecosystem\n",
+              "  All content is 100% real captures from verified sources.\n",
+              bar]
+    readme = "".join(parts).encode("utf-8")
 
     print("☁️  Uploading README to Drive root...")
-    rclone(["copy", str(readme), RCLONE_REMOTE])
-    print("✅ README_TONEHUB_PRO.txt uploaded!")
-
-    import shutil
-    shutil.rmtree(TEMP_DIR)
+    r = subprocess.run(["rclone", "rcat", f"{RCLONE_REMOTE}/{README_NAME}"], input=readme,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if r.returncode != 0:
+        print(f"❌ Upload failed (rclone exit {r.returncode}).")
+        return
+    print(f"✅ {README_NAME} uploaded!")
 
 if __name__ == "__main__":
     main()
@@ -8,25 +8,72 @@ MEGA DOWNLOADER v3 — Clean + Expand
 All runs on GitHub Actions. Zero local bandwidth.
 Uploads to gdrive2:IR_DEF_REPOSITORY.
 """
-import os, sys, json, re, time, hashlib, zipfile, struct, shutil, logging, argparse, subprocess
+import os, io, sys, json, re, time, zlib, atexit, signal, struct, hashlib, zipfile, shutil, logging, argparse, tempfile, itertools, subprocess, functools, threading
+from collections import Counter, OrderedDict, defaultdict, deque
 from pathlib import Path
 from urllib.parse import urlparse, unquote, quote
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 try:
     from tqdm import tqdm
 except ImportError:
     tqdm = lambda x, **kwargs: x  # Fallback if not installed
+try:
+    import blake3
+except ImportError:
+    blake3 = None  # Fallback: sha256 from hashlib
+try:
+    import xxhash
+except ImportError:
+    xxhash = None  # Fallback: blake3 or blake2b
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None  # Fallback: the catalog keyword regex table
+try:
+    import ijson
+    LSJSON_ERRORS = (ValueError, ijson.common.JSONError)  # empty or cut-off listing
+except ImportError:
+    ijson = None  # Fallback: rclone prints one JSON object per line
+    LSJSON_ERRORS = (ValueError,)
+try:
+    import orjson
+except ImportError:
+    orjson = None  # Fallback: stdlib json for the cache, catalog and stats files
+try:
+    from zlib_ng import zlib_ng as fast_zlib
+except ImportError:
+    try:
+        from isal import isal_zlib as fast_zlib
+    except ImportError:
+        fast_zlib = zlib  # Fallback: stdlib inflate
+zipfile.zlib = fast_zlib  # zipfile resolves zlib.decompressobj at call time
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
+from urllib3.exceptions import DecodeError, ProtocolError, ReadTimeoutError
 
 # ============ CONFIG ============
 BASE_DIR = Path(os.environ.get("OUTPUT_DIR", "/tmp/ir_repository"))
 CACHE_FILE = BASE_DIR / ".download_cache.json"
 LOG_FILE = BASE_DIR / ".download.log"
-VALID_EXT = {".wav", ".nam"}
+# Deliberately strict: a name with junk after the extension ("x.wav?dl=1") would be
+# organized under that junk name, so it is skipped rather than matched loosely
+VALID_EXT = frozenset({".wav", ".nam"})
+VALID_ENDINGS = tuple(VALID_EXT)  # for str.endswith on already-lowered names
 RCLONE_REMOTE = os.environ.get("RCLONE_REMOTE", "gdrive2:IR_DEF_REPOSITORY")
-MAX_WORKERS = 6
+# rclone deletes on its checker goroutines; keep many in flight, list recursively
+# in as few API calls as possible, and delete outright instead of moving to trash
+RCLONE_DELETE_FLAGS = ["--checkers", "32", "--transfers", "64", "--fast-list", "--drive-use-trash=false"]
+# Downloads are network-bound threads (sockets release the GIL); CPU-heavy
+# inflate is capped separately, so the thread budget can run well past the core count
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", "32"))      # global thread budget across all hosts
+PER_HOST_LIMIT = int(os.environ.get("PER_HOST_LIMIT", "10"))  # concurrent downloads against any single host
+HASH_CACHE_MAX = 200_000  # LRU cap on remembered content hashes in the cache file
+DEDUP_SEEN_MAX = 500_000  # LRU cap on digests cleanup_local remembers while deduplicating
+SAVE_INTERVAL = 30  # seconds between background cache writes; phase ends and exit always flush
+REMOTE_ZIP_MIN = 64 * 1024 * 1024  # read bigger range-capable zips member-by-member
+SPOOL_MEMORY_MAX = 64 * 1024 * 1024  # unstreamable zips up to this size are buffered in RAM, not on disk
+EXTRACT_THREADS = 4  # inflate workers per archive (total across archives capped at the core count)
 
 # Junk patterns — files to delete from Drive
 JUNK_EXTENSIONS = {
@@ -81,14 +128,19 @@ def setup():
 
 # ============ SESSION ============
 def make_session():
+    """One long-lived session for the whole run; keep-alive pools per host are reused by every phase."""
     s = requests.Session()
+    # pool_connections is how many per-host pools urllib3 keeps before evicting the
+    # least recent one (and its keep-alive sockets); direct zips round-robin across
+    # every host, so it must cover all of them plus the GitHub hosts
+    hosts = max(32, MAX_WORKERS, len({urlparse(u).hostname for u, _ in DIRECT_ZIPS}) + 8)
     s.mount("https://", HTTPAdapter(
         max_retries=Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504]),
-        pool_maxsize=20
+        pool_connections=hosts, pool_maxsize=max(64, MAX_WORKERS), pool_block=False
     ))
     s.mount("http://", HTTPAdapter(
         max_retries=Retry(total=2, backoff_factor=1, status_forcelist=[500, 502, 503]),
-        pool_maxsize=10
+        pool_connections=hosts, pool_maxsize=max(64, MAX_WORKERS), pool_block=False
     ))
     s.headers.update({"User-Agent": "IR-DEF-Mega/3.0", "Accept-Encoding": "gzip, deflate"})
     token = os.environ.get("GITHUB_TOKEN", "")
@@ -96,67 +148,316 @@ def make_session():
         s.headers["Authorization"] = f"Bearer {token}"
     return s
 
+# Per-host slots: many hosts can download at once, none gets more than PER_HOST_LIMIT.
+# Downloaders hold a slot only while transferring, then hash/organize outside it,
+# so with MAX_WORKERS > PER_HOST_LIMIT the network and the CPU work overlap.
+# Threads rather than asyncio: socket reads, hashing and zlib all release the GIL,
+# the ceiling on in-flight transfers is these slots (not the thread count), and CI
+# installs nothing beyond requests.
+_host_slots = defaultdict(lambda: threading.BoundedSemaphore(PER_HOST_LIMIT))
+_host_slots_lock = threading.Lock()
+
+def host_slot(url):
+    with _host_slots_lock:
+        return _host_slots[urlparse(url).hostname or ""]
+
+class HostLease:
+    """`with HostLease(url) as lease:` holds one of url's host slots; lease.release()
+    hands it back early, e.g. once an archive is fully received but before it is
+    extracted, so the next transfer to that host starts while this one unpacks."""
+    def __init__(self, url):
+        self.slot = host_slot(url)
+        self.held = False
+
+    def __enter__(self):
+        self.slot.acquire()
+        self.held = True
+        return self
+
+    def release(self):
+        if self.held:
+            self.held = False
+            self.slot.release()
+
+    def __exit__(self, *exc):
+        self.release()
+
+def per_host(url, fn, *args):
+    """Run fn(*args) while holding one of url's host slots."""
+    with host_slot(url):
+        return fn(*args)
+
 # ============ CACHE ============
+# Older caches are sha256; new ones take the fastest available algorithm
+HASHERS = {
+    "sha256": hashlib.sha256,
+    "blake2b": lambda: hashlib.blake2b(digest_size=32),
+}
+if blake3:
+    HASHERS["blake3"] = lambda: blake3.blake3(max_threads=blake3.blake3.AUTO)
+if xxhash:
+    # Not cryptographic, but 128 bits is plenty for dedup keys and it hashes at memory speed
+    HASHERS["xxh3_128"] = xxhash.xxh3_128
+HASH_ALGO = "xxh3_128" if xxhash else "blake3" if blake3 else "blake2b"
+
+def digest_rest(fh, head=b"", algo=HASH_ALGO):
+    """Finish hashing fh, whose first bytes (head) were already read, in 1 MiB chunks."""
+    h = HASHERS[algo]()
+    h.update(head)
+    buf = memoryview(bytearray(1 << 20))
+    while n := fh.readinto(buf):
+        h.update(buf[:n])
+    return h.hexdigest()
+
+def file_digest(path, algo=HASH_ALGO):
+    """Hash a file in fixed-size chunks so peak memory stays at 1 MiB, not the file size."""
+    if algo == "blake3":
+        h = HASHERS[algo]()
+        if hasattr(h, "update_mmap"):  # blake3 >= 0.3.4: mmap + its own threads
+            h.update_mmap(path)
+            return h.hexdigest()
+    with open(path, "rb") as fh:
+        if algo != "blake3" and hasattr(hashlib, "file_digest"):  # 3.11+
+            return hashlib.file_digest(fh, HASHERS[algo]).hexdigest()
+        return digest_rest(fh, algo=algo)
+
+def try_digest(path, algo=HASH_ALGO):
+    """file_digest, or None when the file can't be read."""
+    try:
+        return file_digest(path, algo)
+    except OSError:
+        return None
+
+def sample_key(path, size, block=4096):
+    """(size, digest of the first, middle and last 4 KiB): equal for any two
+    identical files, and almost never for two different ones. None if unreadable."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+    try:
+        h = hashlib.blake2b(digest_size=16)
+        for off in (0, size // 2, max(size - block, 0)):
+            h.update(os.pread(fd, block, off))
+        return size, h.digest()
+    except OSError:
+        return None
+    finally:
+        os.close(fd)
+
 class Cache:
     def __init__(self):
-        self.data = {"urls": [], "hashes": {}}
+        self.data = {"urls": [], "hashes": {}, "hash_algo": HASH_ALGO}
         if CACHE_FILE.exists():
             try:
-                self.data = json.loads(CACHE_FILE.read_text("utf-8"))
+                raw = CACHE_FILE.read_bytes()
+                self.data = orjson.loads(raw) if orjson else json.loads(raw)
             except:
                 pass
-
-    def save(self):
-        CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
-        CACHE_FILE.write_text(json.dumps(self.data), "utf-8")
+        # Hashes only compare within one algorithm: a history built with another one
+        # (e.g. sha256) is dropped once and dedup restarts on HASH_ALGO
+        algo = self.data.get("hash_algo", "sha256")
+        migrated = algo != HASH_ALGO
+        if migrated:
+            if self.data["hashes"]:
+                logging.info(f"Cache: dropped {len(self.data['hashes'])} legacy {algo} hashes, now on {HASH_ALGO}")
+            self.data["hashes"] = {}
+        self.data["hash_algo"] = self.hash_algo = HASH_ALGO
+        # Every new file's full hash is persisted (that is what catches the same
+        # content arriving on a later run), so the old quick-key tables are dropped
+        self.data.pop("quick", None)
+        self.data.pop("full_hash_only", None)
+        self._pending = {}  # path is_dup just accepted -> its full hash
+        self.data.setdefault("api", {})  # GitHub API url -> [etag, slimmed body]; archive url -> [etag, None]
+        self.data.setdefault("members", {})  # "size:crc32" of zip members already extracted
+        # URLs live in a set while running and go back to a JSON list on write
+        self._url_set = set(self.data.pop("urls", []))
+        # Download workers share one Cache; serialize mutations against flush()
+        self._lock = threading.RLock()
+        self._write_lock = threading.RLock()  # re-entered by the SIGTERM flush
+        self._dirty = int(migrated)  # write the switch even if nothing else changes
+        atexit.register(self.flush)
+        # Workers only count changes; one background thread does the writing
+        threading.Thread(target=self._autosave, daemon=True).start()
+
+    def _autosave(self):
+        while True:
+            time.sleep(SAVE_INTERVAL)
+            try:
+                self.flush()
+            except Exception as e:  # e.g. ENOSPC: keep the thread, try again next round
+                logging.warning(f"Cache autosave failed: {e}")
+
+    def flush(self):
+        """Write the cache now, through a temp file so a crash never leaves it half-written.
+        A no-op when nothing changed since the last write."""
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                # Hashes are kept in recency order (oldest first); drop the tail past the cap
+                for table in (self.data["hashes"], self.data["members"]):
+                    excess = len(table) - HASH_CACHE_MAX
+                    if excess > 0:
+                        for k in list(table)[:excess]:
+                            del table[k]
+                # Shallow copies are all the lock covers; sorting and encoding the
+                # snapshot happen after it is released, so workers never wait on them
+                urls = list(self._url_set)
+                data = {k: dict(v) if isinstance(v, dict) else v for k, v in self.data.items()}
+                self._dirty = 0
+            urls.sort()
+            data = {"urls": urls, **data}
+            if orjson:
+                payload = orjson.dumps(data)
+            else:
+                payload = json.dumps(data, separators=(",", ":")).encode()
+            CACHE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            tmp = CACHE_FILE.with_name(CACHE_FILE.name + ".tmp")
+            tmp.write_bytes(payload)
+            os.replace(tmp, CACHE_FILE)
 
     def seen(self, url):
-        return url in self.data["urls"]
+        return url in self._url_set
 
     def seen_any(self, *keys):
         """Check if ANY of the given keys have been seen (for backwards compat)."""
-        for k in keys:
-            if k in self.data["urls"]:
-                return True
-        return False
+        return any(k in self._url_set for k in keys)
 
     def mark(self, url):
-        if url not in self.data["urls"]:
-            self.data["urls"].append(url)
+        with self._lock:
+            self._url_set.add(url)
+            self._dirty += 1
+
+    def _remember(self, h, filepath):
+        hashes = self.data["hashes"]
+        if h in hashes:
+            hashes[h] = hashes.pop(h)  # refresh LRU position
+            return True
+        hashes[h] = str(filepath)
+        self._dirty += 1
+        return False
 
     def is_dup(self, filepath):
-        h = hashlib.sha256(Path(filepath).read_bytes()).hexdigest()
-        if h in self.data["hashes"]:
+        """True if a file with the same full hash was seen, this run or an earlier one.
+        The hash runs outside the lock so other workers aren't held up."""
+        filepath = str(filepath)
+        h = file_digest(filepath, self.hash_algo)
+        with self._lock:
+            if self._remember(h, filepath):
+                return True
+            self._pending[filepath] = h
+            return False
+
+    def placed(self, src, dest):
+        """src (just accepted by is_dup) now lives at dest: record that path, which
+        outlives the extract dir, against its hash."""
+        src, dest = str(src), str(dest)
+        with self._lock:
+            h = self._pending.pop(src, None)
+            if h is not None and self.data["hashes"].get(h) == src:
+                self.data["hashes"][h] = dest
+
+    def has_member(self, key):
+        members = self.data["members"]
+        if key in members:
+            with self._lock:
+                members[key] = members.pop(key, 1)  # refresh LRU position
             return True
-        self.data["hashes"][h] = str(filepath)
         return False
 
+    def add_members(self, keys):
+        with self._lock:
+            for key in keys:
+                self.data["members"][key] = 1
+            self._dirty += len(keys)
+
+    def api_entry(self, url):
+        return self.data["api"].get(url)
+
+    def set_api_entry(self, url, etag, body):
+        with self._lock:
+            self.data["api"][url] = [etag, body]
+            self._dirty += 1
+
     def reset_for_expansion(self):
         """Clear only the URL cache (not hashes) to re-download from same sources."""
-        self.data["urls"] = []
+        with self._lock:
+            self._url_set = set()
+            self._dirty += 1
 
 # ============ VALIDATION ============
 def is_valid_wav(path):
+    """Check the RIFF/WAVE header with one raw 12-byte read (no file object, no readahead)."""
+    buf = bytearray(12)
     try:
-        with open(path, "rb") as f:
-            h = f.read(12)
-            if len(h) < 12:
-                return False
-            r, _, w = struct.unpack("<4sI4s", h)
-            return r == b"RIFF" and w == b"WAVE"
-    except:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
         return False
+    try:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(fd, 0, 12, os.POSIX_FADV_RANDOM)
+        n = os.readv(fd, [buf])
+    except OSError:
+        return False
+    finally:
+        os.close(fd)
+    return n == 12 and buf[0:4] == b"RIFF" and buf[8:12] == b"WAVE"
 
 def is_valid(path):
-    p = Path(path)
     try:
-        if p.stat().st_size < 100:
+        if os.stat(path).st_size < 100:
             return False
     except:
         return False
-    if p.suffix.lower() == ".wav":
-        return is_valid_wav(p)
-    return p.suffix.lower() == ".nam"
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".wav":
+        return is_valid_wav(path)
+    return ext == ".nam"
+
+def scan_files(root, skip_dirs=(".", "__")):
+    """
+    Yield (dir_path, DirEntry) for every file under root.
+    One os.scandir pass per directory: name/suffix come from the entry and
+    its stat() is cached, so nothing is looked up twice per file. Walks with an
+    explicit stack (same pre-order as recursion) so deep trees don't pay for
+    yields passing through one generator per level.
+    """
+    stack = [root]
+    while stack:
+        d = stack.pop()
+        try:
+            it = os.scandir(d)
+        except OSError:
+            continue
+        subdirs = []
+        with it:
+            for e in it:
+                if e.is_dir(follow_symlinks=False):
+                    if not e.name.startswith(skip_dirs):
+                        subdirs.append(e.path)
+                    continue
+                yield d, e
+        stack.extend(reversed(subdirs))
+
+def count_valid(root):
+    """Number of files under root with a valid extension (names only, no stat)."""
+    return sum(1 for _, e in scan_files(root, skip_dirs=()) if e.name.lower().endswith(VALID_ENDINGS))
+
+def iter_valid_audio(root, exts=VALID_EXT, skip_dirs=(".", "__")):
+    """Yield (dir_path, DirEntry) for every valid audio file under root."""
+    for d, e in scan_files(root, skip_dirs):
+        ext = os.path.splitext(e.name)[1].lower()
+        if ext not in exts:
+            continue
+        try:
+            if e.stat().st_size < 100:
+                continue
+        except OSError:
+            continue
+        if ext == ".wav" and not is_valid_wav(e.path):
+            continue
+        yield d, e
 
 # ============ BRAND DETECTION ============
 BRANDS = {
@@ -199,37 +500,149 @@ BRANDS = {
 CABS = {"1x12": [r"1x12"], "2x12": [r"2x12"], "4x12": [r"4x12"], "4x10": [r"4x10"], "8x10": [r"8x10"], "1x15": [r"1x15"]}
 MICS = {"SM57": [r"sm57"], "MD421": [r"md421"], "R121": [r"r121", r"royer"], "U87": [r"u87"], "E609": [r"e609"]}
 
-def _match(text, patterns):
-    t = text.lower()
-    for key, pats in patterns.items():
-        for p in pats:
-            if re.search(p, t):
-                return key
-    return None
+def _compile_table(table, flags=0):
+    """
+    Fold a {key: [patterns]} table into one zero-width alternation.
+    Group _<i> marks key i, so a single finditer pass reports every key that
+    matches anywhere; the lowest index wins, same priority as dict order.
+    """
+    keys = list(table)
+    alt = "|".join(f"(?P<_{i}>{'|'.join(pats)})" for i, pats in enumerate(table.values()))
+    return re.compile(f"(?=(?:{alt}))", flags), keys
+
+_BRAND_RE = _compile_table(BRANDS)
+# Brand + cab + mic folded into one table for clean_filename. Cab patterns start
+# with "NxNN" and mic patterns with model codes, so none of them can begin a match
+# at the same offset as a brand pattern and the single alternation loses no hits.
+_TAG_RE = _compile_table({**BRANDS, **CABS, **MICS})
+_BRAND_BITS = (1 << len(BRANDS)) - 1
+_CAB_BITS = ((1 << len(CABS)) - 1) << len(BRANDS)
+_MIC_BITS = ((1 << len(MICS)) - 1) << (len(BRANDS) + len(CABS))
+
+def _match_index(text, table):
+    """Index of the first table key matching text, or len(keys) if none does."""
+    rx, keys = table
+    best = len(keys)
+    for m in rx.finditer(text.lower()):
+        i = int(m.lastgroup[1:])
+        if i < best:
+            best = i
+            if i == 0:
+                break
+    return best
+
+def _match(text, table):
+    i = _match_index(text, table)
+    return table[1][i] if i < len(table[1]) else None
+
+def _tag_mask(text, table=_TAG_RE):
+    """One finditer pass over text; bit i is set when table key i matches."""
+    mask = 0
+    for m in table[0].finditer(text.lower()):
+        mask |= 1 << int(m.lastgroup[1:])
+    return mask
+
+def _lowest_tag(mask, bits, table=_TAG_RE):
+    x = mask & bits
+    return table[1][(x & -x).bit_length() - 1] if x else None
+
+# Model patterns for clean_filename, in priority order (first matching label wins)
+MODEL_PATTERNS = {
+    "JCM": [r"JCM\s*?800", r"JCM\s*?900", r"JCM\s*?2000"],
+    "Rectifier": [r"Dual\s*?Rect", r"Triple\s*?Rect", r"Recto"],
+    "5150": [r"5150", r"6505"],
+    "VoxAC": [r"AC\s*?30", r"AC\s*?15"],
+    "Fender": [r"Twin", r"Deluxe", r"Princeton", r"Bassman"],
+    "Ampeg": [r"SVT", r"B15"],
+    "Plexi": [r"Plexi", r"1959", r"1987"],
+    "Bogner": [r"Uberschall", r"Ecstasy"],
+    "Diezel": [r"VH4", r"Herbert"],
+    "FriedmanBE": [r"BE\s*?100", r"HBE"],
+    "Randall": [r"Satan", r"Thrasher"],
+}
+# Tone/channel keywords for clean_filename, in priority order
+TONE_KEYWORDS = {
+    "HiGain": [r"(high|hi).?gain", r"metal", r"lead", r"dist", r"ch3", r"red"],
+    "Crunch": [r"crunch", r"drive", r"breakup", r"ch2", r"orange"],
+    "Clean": [r"clean", r"jazz", r"ch1", r"green"],
+}
+# Models and tones share one pass: no model pattern can start at the same offset
+# as a tone pattern, so (as with _TAG_RE) the alternation loses no hits
+_DETAIL_RE = _compile_table({**MODEL_PATTERNS, **TONE_KEYWORDS}, re.I)
+_MODEL_BITS = (1 << len(MODEL_PATTERNS)) - 1
+_TONE_BITS = ((1 << len(TONE_KEYWORDS)) - 1) << len(MODEL_PATTERNS)
+# Folder keywords for categorize, in priority order (first matching category wins)
+CATEGORY_KEYWORDS = {
+    "IR_Bajo": ["bass", "bajo", "svt", "ampeg", "darkglass", "8x10", "4x10", "b-15", "b15", "portaflex"],
+    "IR_Acustica": ["acoustic", "piezo", "electroac", "taylor", "martin", "nylon", "body"],
+    "IR_Utilidades": ["reverb", "room", "hall", "plate", "spring", "echo", "ambient", "space", "convol"],
+}
+_CATEGORY_RE = _compile_table({k: [re.escape(w) for w in ws] for k, ws in CATEGORY_KEYWORDS.items()})
+
+_STEM_JUNK_RE = re.compile(r"(ir|demo|test|v[0-9]|final|mix|wav|nam|capture|profile|rig)", re.I)
+# Catalog type hints, then tags. No keyword is a prefix of another, so no two can
+# match at the same offset and one _tag_mask pass reports every hit
+CATALOG_KEYWORDS = {
+    "Bass IR": ["bass", "bajo"],
+    "Acoustic IR": ["acoust"],
+    "Clean": ["clean"],
+    "Crunch": ["crunch"],
+    "High Gain": ["high gain", "metal", "dist"],
+    "Fuzz": ["fuzz"],
+    "Cab": ["cab"],
+    "Pedal": ["pedal"],
+}
+_CATALOG_RE = _compile_table({k: [re.escape(w) for w in ws] for k, ws in CATALOG_KEYWORDS.items()})
+_CATALOG_TAGS = list(enumerate(CATALOG_KEYWORDS))[2:]
+
+def _keyword_automaton(table):
+    """The keywords are plain strings: one automaton walk finds them all, overlaps included."""
+    ac = ahocorasick.Automaton()
+    for i, words in enumerate(table.values()):
+        for w in words:
+            ac.add_word(w, 1 << i)
+    ac.make_automaton()
+    return ac
+
+_CATALOG_AC = _keyword_automaton(CATALOG_KEYWORDS) if ahocorasick else None
+
+def _catalog_mask(text):
+    """Bit i set when CATALOG_KEYWORDS key i occurs in (lowercase) text."""
+    if _CATALOG_AC is None:
+        return _tag_mask(text, _CATALOG_RE)
+    mask = 0
+    for _, bit in _CATALOG_AC.iter(text):
+        mask |= bit
+    return mask
+
+_BRACKETS_RE = re.compile(r"[\(\)\[\]]")
+_NON_ALNUM_RE = re.compile(r"[^a-zA-Z0-9]")
+_UNDERSCORES_RE = re.compile(r"_+")
+_CD_FILENAME_RE = re.compile(r'filename="?([^";\n]+)')
+
+# Category keywords are plain words, so no hit spans a "/": the directory part
+# of a context is ranked once for all its siblings, only the tail per file.
+@functools.lru_cache(maxsize=4096)
+def _category_rank(context_dir):
+    return _match_index(context_dir, _CATEGORY_RE)
 
 def categorize(context, filename):
-    c = (context + " " + filename).lower()
-    ext = Path(filename).suffix.lower()
-    if ext == ".nam":
+    if filename.lower().endswith(".nam"):
         return "NAM_Capturas"
-    if any(k in c for k in ["bass", "bajo", "svt", "ampeg", "darkglass", "8x10", "4x10", "b-15", "b15", "portaflex"]):
-        return "IR_Bajo"
-    if any(k in c for k in ["acoustic", "piezo", "electroac", "taylor", "martin", "nylon", "body"]):
-        return "IR_Acustica"
-    if any(k in c for k in ["reverb", "room", "hall", "plate", "spring", "echo", "ambient", "space", "convol"]):
-        return "IR_Utilidades"
-    return "IR_Guitarra"
+    head, _, tail = context.rpartition("/")
+    i = min(_category_rank(head), _match_index(tail + " " + filename, _CATEGORY_RE))
+    return _CATEGORY_RE[1][i] if i < len(CATEGORY_KEYWORDS) else "IR_Guitarra"
 
 def clean_filename(context, filename):
     """
     Genera un nombre estandarizado: Marca_Modelo_Cabina_Mic_Info.
     Si no detecta info relevante, usa el nombre del Pack/Repo como prefijo.
     """
-    stem = Path(filename).stem
-    suffix = Path(filename).suffix.lower()
+    stem, suffix = os.path.splitext(filename)  # no Path objects per file
+    suffix = suffix.lower()
     
     # Pre-limpieza del stem
-    stem = re.sub(r"[\(\)\[\]]", "", stem) # Quitar parentesis/corchetes
+    stem = _BRACKETS_RE.sub("", stem) # Quitar parentesis/corchetes
     stem = stem.replace(" ", "_").replace("-", "_").replace(".", "_")
     
     # Contexto completo para busqueda (nombre archivo + carpeta padre + nombre repo)
@@ -238,88 +651,125 @@ def clean_filename(context, filename):
     parts = []
 
     # 1. DETECTAR MARCA (Prioridad Alta)
-    brand = _match(full_context, BRANDS)
+    tags = _tag_mask(full_context)
+    brand = _lowest_tag(tags, _BRAND_BITS)
     if brand:
         parts.append(brand)
     
     # 2. DETECTAR MODELO (Agresivo)
-    # Buscamos patrones comunes de amplis/pedales
-    model_patterns = [
-        (r"(JCM\s*?800|JCM\s*?900|JCM\s*?2000)", "JCM"),
-        (r"(Dual\s*?Rect|Triple\s*?Rect|Recto)", "Rectifier"),
-        (r"(5150|6505)", "5150"),
-        (r"(AC\s*?30|AC\s*?15)", "VoxAC"),
-        (r"(Twin|Deluxe|Princeton|Bassman)", "Fender"),
-        (r"(SVT|B15)", "Ampeg"),
-        (r"(Plexi|1959|1987)", "Plexi"),
-        (r"(Uberschall|Ecstasy)", "Bogner"),
-        (r"(VH4|Herbert)", "Diezel"),
-        (r"(BE\s*?100|HBE)", "FriedmanBE"),
-        (r"(Satan|Thrasher)", "Randall"),
-    ]
-    
-    for pat, label in model_patterns:
-        if re.search(pat, full_context, re.I):
-            if label not in parts and (not brand or brand not in label): 
-                parts.append(label)
-            break
+    # Buscamos patrones comunes de amplis/pedales (ver MODEL_PATTERNS)
+    details = _tag_mask(full_context, _DETAIL_RE)
+    label = _lowest_tag(details, _MODEL_BITS, _DETAIL_RE)
+    if label:
+        if label not in parts and (not brand or brand not in label):
+            parts.append(label)
 
     # 3. CABINA (1x12, 4x12, etc)
-    cab = _match(full_context, CABS)
+    cab = _lowest_tag(tags, _CAB_BITS)
     if cab:
         parts.append(cab)
 
     # 4. MICROFONO
-    mic = _match(full_context, MICS)
+    mic = _lowest_tag(tags, _MIC_BITS)
     if mic:
         parts.append(mic)
 
     # 5. TONO / CANAL
-    if re.search(r"(high|hi).?gain|metal|lead|dist|ch3|red", full_context):
-        parts.append("HiGain")
-    elif re.search(r"crunch|drive|breakup|ch2|orange", full_context):
-        parts.append("Crunch")
-    elif re.search(r"clean|jazz|ch1|green", full_context):
-        parts.append("Clean")
+    tone = _lowest_tag(details, _TONE_BITS, _DETAIL_RE)
+    if tone:
+        parts.append(tone)
 
     # 6. INSTANCIA DE RESPALDO (Si no hay mucha info)
     # Si tenemos muy pocas partes, usamos limpiamente el nombre original o el de la carpeta
     if len(parts) < 2:
         # Extraer palabras clave del nombre original que no sean basura
-        clean_stem = re.sub(r"(ir|demo|test|v[0-9]|final|mix|wav|nam|capture|profile|rig)", "", stem, flags=re.I)
-        clean_stem = re.sub(r"_+", "_", clean_stem).strip("_")
+        clean_stem = _STEM_JUNK_RE.sub("", stem)
+        clean_stem = _UNDERSCORES_RE.sub("_", clean_stem).strip("_")
         
         # Si el nombre quedo muy corto (ej: "01"), traemos el nombre de la carpeta padre
         if len(clean_stem) < 3:
             parent = Path(context).parent.name if "/" in context else context
-            parent = re.sub(r"[^a-zA-Z0-9]", "", parent)
+            parent = _NON_ALNUM_RE.sub("", parent)
             clean_stem = f"{parent}_{clean_stem}"
             
         parts.append(clean_stem[:40]) # Limite de caracteres para evitar nombres kilometricos
 
     # Ensamblar y limpiar final
     final_name = "_".join(parts)
-    final_name = re.sub(r"_+", "_", final_name).strip("_")
+    final_name = _UNDERSCORES_RE.sub("_", final_name).strip("_")
     
     # Capitalizar estilo Titulo (Marshall_Jcm800...)
     final_name = "_".join([p.capitalize() for p in final_name.split("_")])
 
     return f"{final_name}{suffix}"
 
-def organize_file(src_path, context=""):
-    fn = Path(src_path).name
+# Names already present per destination dir (seeded from one scandir) and the
+# next _N suffix to try per base name, so collisions never re-stat the disk.
+_dir_names = {}
+_dir_counters = {}
+_dest_lock = threading.Lock()
+
+def _claim_dest(dest_dir, name):
+    """Reserve a free name in dest_dir, appending _1, _2, ... on collision."""
+    with _dest_lock:
+        taken = _dir_names.get(dest_dir)
+        if taken is None:
+            taken = _dir_names[dest_dir] = {e.name for e in os.scandir(dest_dir)}
+        if name not in taken:
+            taken.add(name)
+            return dest_dir / name
+        s, x = os.path.splitext(name)
+        i = _dir_counters.get((dest_dir, name), 1)
+        while f"{s}_{i}{x}" in taken:
+            i += 1
+        _dir_counters[(dest_dir, name)] = i + 1
+        taken.add(f"{s}_{i}{x}")
+        return dest_dir / f"{s}_{i}{x}"
+
+def fast_copy(src, dst):
+    """Copy contents only (no copy2 metadata syscalls), in-kernel via copy_file_range."""
+    with open(src, "rb") as s, open(dst, "wb") as d:
+        left = os.fstat(s.fileno()).st_size
+        try:
+            while left > 0:
+                n = os.copy_file_range(s.fileno(), d.fileno(), left)
+                if not n:
+                    break
+                left -= n
+        except (AttributeError, OSError):  # Python < 3.8 or no kernel support
+            pass
+    if left > 0:
+        shutil.copyfile(src, dst)  # sendfile() on Linux
+
+def plan_dest(src_path, context=""):
+    """Pick and reserve src_path's destination (category dir + clean, unique name)."""
+    fn = os.path.basename(src_path)
     cat = categorize(context or str(src_path), fn)
     dest_dir = BASE_DIR / cat
     dest_dir.mkdir(parents=True, exist_ok=True)
     name = clean_filename(context or str(src_path), fn)
-    dest = dest_dir / name
-    if dest.exists():
-        s, x = Path(name).stem, Path(name).suffix
-        i = 1
-        while dest.exists():
-            dest = dest_dir / f"{s}_{i}{x}"
-            i += 1
-    shutil.copy2(src_path, dest)
+    return _claim_dest(dest_dir, name)
+
+def place_file(src_path, dest):
+    """Link (or copy) src_path to dest. Paths stay absolute: the rename tier hands
+    these to worker threads, which would outlive os.fwalk's per-directory fds."""
+    try:
+        # Extract dirs and BASE_DIR both live under /tmp: a hardlink is O(1)
+        os.link(src_path, dest)
+    except OSError:  # EXDEV, or a filesystem without hardlinks
+        fast_copy(src_path, dest)
+    return dest
+
+def organize_file(src_path, context=""):
+    return place_file(src_path, plan_dest(src_path, context))
+
+def organize_new(cache, src_path, context=""):
+    """organize_file unless the cache already has src_path's content.
+    Returns the destination, or None for a duplicate."""
+    if cache.is_dup(src_path):
+        return None
+    dest = organize_file(src_path, context)
+    cache.placed(src_path, dest)
     return dest
 
 # ============================================================
@@ -331,112 +781,127 @@ def cleanup_drive():
     logging.info("🧹 CLEANUP: Removing junk files from Drive")
     logging.info("=" * 60)
 
+    # One rclone pass (one listing, one process) covers every junk extension and
+    # dot/dunder files at any depth, plus the known junk names (LICENSE, Makefile, ...
+    # which have no junk extension) at the root only, where stray repo files land;
+    # --rmdirs then drops the directories it leaves empty
+    exts = ",".join(sorted(e[1:] for e in JUNK_EXTENSIONS))
+    names = ",".join(sorted(JUNK_FILENAMES))
+    # Deletions are counted from the verbose log as rclone prints it (one buffered
+    # pipe, read line by line) rather than from a buffered copy at the end
     deleted = 0
-    errors = 0
-
-    # 1. Delete known junk files at root level
-    junk_root_files = [
-        ".download_cache.json", ".download.log", ".stats.json", "README.md"
-    ]
-    for jf in junk_root_files:
-        try:
-            result = subprocess.run(
-                ["rclone", "deletefile", f"{RCLONE_REMOTE}/{jf}"],
-                capture_output=True, text=True, timeout=30
-            )
-            if result.returncode == 0:
-                logging.info(f"  🗑️  Deleted root: {jf}")
-                deleted += 1
-            else:
-                logging.debug(f"  Skip {jf}: {result.stderr.strip()[:80]}")
-        except:
-            pass
-
-    # 2. Delete all non-wav/non-nam files from every folder
-    for ext in list(JUNK_EXTENSIONS):
-        try:
-            result = subprocess.run(
-                ["rclone", "delete", RCLONE_REMOTE,
-                 "--include", f"*{ext}",
-                 "--verbose"],
-                capture_output=True, text=True, timeout=120
-            )
-            if result.returncode == 0 and result.stderr.strip():
-                # Count deleted lines
-                del_lines = [l for l in result.stderr.split("\n") if "Deleted" in l or "deleted" in l]
-                if del_lines:
-                    logging.info(f"  🗑️  Deleted {len(del_lines)} *{ext} files")
-                    deleted += len(del_lines)
-        except:
-            pass
-
-    # 3. Delete hidden/dot files
-    for pattern in [".*", "__*"]:
-        try:
-            subprocess.run(
-                ["rclone", "delete", RCLONE_REMOTE, "--include", pattern],
-                capture_output=True, text=True, timeout=60
-            )
-        except:
-            pass
-
-    # 4. Cleanup empty directories
+    tail = deque(maxlen=5)
     try:
-        subprocess.run(
-            ["rclone", "rmdirs", RCLONE_REMOTE],
-            capture_output=True, text=True, timeout=60
+        proc = subprocess.Popen(
+            ["rclone", "delete", RCLONE_REMOTE,
+             "--include", f"*.{{{exts}}}",
+             "--include", f"/{{{names}}}",
+             "--include", ".*",
+             "--include", "__*",
+             "--rmdirs", "--verbose", *RCLONE_DELETE_FLAGS],
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, bufsize=1 << 20
         )
-    except:
-        pass
+        killer = threading.Timer(600, proc.kill)
+        killer.start()
+        try:
+            for line in proc.stderr:
+                if "Deleted" in line or "deleted" in line:
+                    deleted += 1
+                tail.append(line)
+        finally:
+            killer.cancel()
+            proc.stderr.close()
+        if proc.wait() != 0:
+            logging.warning(f"  rclone delete failed: {''.join(tail).strip()[-200:]}")
+    except Exception as e:
+        logging.warning(f"  rclone delete failed: {e}")
 
     logging.info(f"  ✅ Cleanup done: ~{deleted} junk items removed")
     return deleted
 
-def cleanup_local():
-    """Delete invalid files from local download directory."""
-    logging.info("🧹 Cleaning local files...")
-    valid = invalid = junk = dup_count = 0
-    seen_hashes = set()
-
-    for root, dirs, files in os.walk(BASE_DIR):
-        dirs[:] = [d for d in dirs if not d.startswith(".")]
-        for f in files:
-            fp = Path(root) / f
-            ext = fp.suffix.lower()
-
-            # Delete junk extensions
-            if ext in JUNK_EXTENSIONS or fp.name in JUNK_FILENAMES:
-                fp.unlink(missing_ok=True)
-                junk += 1
-                continue
+def check_wav_headers(paths):
+    """is_valid_wav over many paths; big batches fan out to a process pool."""
+    if len(paths) < 2048:
+        return [is_valid_wav(p) for p in paths]
+    with ProcessPoolExecutor() as pool:
+        return list(pool.map(is_valid_wav, paths, chunksize=256))
 
-            # Skip non-audio
-            if ext not in VALID_EXT:
-                fp.unlink(missing_ok=True)
-                junk += 1
-                continue
-
-            # Validate audio
-            if not is_valid(fp):
-                fp.unlink(missing_ok=True)
-                invalid += 1
-                continue
+def cleanup_local(kept=None):
+    """Delete invalid files from local download directory.
+    kept: optional list that receives the path of every file left in place."""
+    logging.info("🧹 Cleaning local files...")
+    junk = dup_count = 0
+    if kept is None:
+        kept = []
+    seen_hashes = OrderedDict()  # raw digest bytes, LRU-capped at DEDUP_SEEN_MAX
+
+    # This run's own state files match the junk rules but must stay (the cache may
+    # be mid-write through its .tmp, and flush() skips rewriting an unchanged cache)
+    own = {str(CACHE_FILE), f"{CACHE_FILE}.tmp", str(LOG_FILE)}
+
+    audio = []
+    for _, entry in scan_files(BASE_DIR, skip_dirs=(".",)):
+        if entry.path in own:
+            continue
+        ext = os.path.splitext(entry.name)[1].lower()
 
-            # Deduplicate
+        # Delete junk extensions, then anything that isn't audio
+        if ext in JUNK_EXTENSIONS or entry.name in JUNK_FILENAMES or ext not in VALID_EXT:
             try:
-                h = hashlib.sha256(fp.read_bytes()).hexdigest()
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+            junk += 1
+            continue
+
+        # Size from the cached stat, before opening anything
+        try:
+            size = entry.stat().st_size
+        except OSError:
+            size = 0
+        audio.append((entry.path, ext, size))
+
+    # Validate audio: all WAV headers in one batch
+    wavs = [p for p, ext, size in audio if ext == ".wav" and size >= 100]
+    wav_ok = dict(zip(wavs, check_wav_headers(wavs)))
+    invalid, candidates = [], []
+    for path, ext, size in audio:
+        if size < 100 or (ext == ".wav" and not wav_ok[path]):
+            invalid.append(path)
+        else:
+            candidates.append((path, size))
+
+    # Deduplicate: only files sharing their size with another can be copies, and
+    # of those only ones whose sampled blocks also match get a full hash. Work
+    # runs on a thread pool (hashing releases the GIL); results are reduced
+    # here in scan order so the first copy is the one kept
+    size_count = Counter(size for _, size in candidates)
+    kept.extend(p for p, size in candidates if size_count[size] == 1)
+    shared = [(p, size) for p, size in candidates if size_count[size] > 1]
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as exc:
+        keys = list(exc.map(lambda c: sample_key(*c), shared))
+        key_count = Counter(keys)
+        kept.extend(c[0] for c, k in zip(shared, keys) if k is None or key_count[k] == 1)
+        shared = [c for c, k in zip(shared, keys) if k is not None and key_count[k] > 1]
+        digests = exc.map(lambda c: try_digest(c[0]), shared)
+        for (path, size), h in zip(shared, digests):
+            if h is not None:
+                h = size.to_bytes(8, "little") + bytes.fromhex(h)
                 if h in seen_hashes:
-                    fp.unlink(missing_ok=True)
+                    seen_hashes.move_to_end(h)
+                    Path(path).unlink(missing_ok=True)
                     dup_count += 1
                     continue
-                seen_hashes.add(h)
-            except:
-                pass
-
-            valid += 1
+                seen_hashes[h] = None
+                if len(seen_hashes) > DEDUP_SEEN_MAX:
+                    seen_hashes.popitem(last=False)
+            kept.append(path)
+    for path in invalid:
+        Path(path).unlink(missing_ok=True)
+    valid = len(kept)
 
-    logging.info(f"  Local cleanup: valid={valid}, invalid={invalid}, junk={junk}, dupes={dup_count}")
-    return {"valid": valid, "invalid": invalid, "junk": junk, "dupes": dup_count}
+    logging.info(f"  Local cleanup: valid={valid}, invalid={len(invalid)}, junk={junk}, dupes={dup_count}")
+    return {"valid": valid, "invalid": len(invalid), "junk": junk, "dupes": dup_count}
 
 # ============================================================
 # GITHUB REPOS — 100+ verified sources
@@ -862,67 +1327,446 @@ DIRECT_ZIPS = [
 # ============================================================
 # DOWNLOADER FUNCTIONS
 # ============================================================
-def download_repo(session, cache, repo):
+def gh_graphql_batch(session, repos, batch=20):
+    """
+    Resolve owner/name pairs through the GitHub GraphQL API, 20 aliased
+    repository() lookups per request instead of one REST call per repo.
+    Returns {"owner/name": default_branch} with None for repos that are gone
+    or empty; repos whose batch failed (or no token) are simply absent.
+    """
+    if "Authorization" not in session.headers:
+        return {}
+    repos = [r for r in repos if "/" in r]
+    resolved = {}
+    for i in range(0, len(repos), batch):
+        chunk = repos[i:i + batch]
+        fields = []
+        for j, repo in enumerate(chunk):
+            owner, name = repo.split("/", 1)
+            fields.append(f"r{j}: repository(owner: {json.dumps(owner)}, name: {json.dumps(name)}) "
+                          "{ defaultBranchRef { name } }")
+        try:
+            r = session.post("https://api.github.com/graphql",
+                             json={"query": "query { " + " ".join(fields) + " }"}, timeout=30)
+            if r.status_code != 200:
+                continue
+            data = r.json().get("data") or {}
+        except Exception as e:
+            logging.warning(f"GraphQL batch failed: {e}")
+            continue
+        for j, repo in enumerate(chunk):
+            if f"r{j}" not in data:
+                continue
+            node = data[f"r{j}"] or {}
+            resolved[repo] = (node.get("defaultBranchRef") or {}).get("name")
+    return resolved
+
+def gh_graphql_search(session, queries, first=30, batch=10):
+    """
+    Run repository searches as aliased search() fields, several per GraphQL
+    request instead of one REST call each. Returns {query: [(full_name, size_kb)]};
+    queries whose batch failed (or no token) are absent, for a REST fallback.
+    """
+    if "Authorization" not in session.headers:
+        return {}
+    results = {}
+    for i in range(0, len(queries), batch):
+        chunk = queries[i:i + batch]
+        fields = [f"q{j}: search(query: {json.dumps(q + ' sort:updated')}, type: REPOSITORY, first: {first}) "
+                  "{ nodes { ... on Repository { nameWithOwner diskUsage } } }"
+                  for j, q in enumerate(chunk)]
+        try:
+            r = session.post("https://api.github.com/graphql",
+                             json={"query": "query { " + " ".join(fields) + " }"}, timeout=30)
+            if r.status_code != 200:
+                continue
+            data = r.json().get("data") or {}
+        except Exception as e:
+            logging.warning(f"GraphQL search failed: {e}")
+            continue
+        for j, q in enumerate(chunk):
+            if not data.get(f"q{j}"):
+                continue
+            results[q] = [(n["nameWithOwner"], n.get("diskUsage") or 0)
+                          for n in data[f"q{j}"].get("nodes") or [] if n]
+    return results
+
+# ============ STREAMING UNZIP ============
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+UNZIP_CHUNK = 1024 * 1024
+
+class MemberFilter:
+    """
+    Skip zip members whose (size, CRC-32) an earlier extraction already produced;
+    both come from the zip headers, so a known file costs no inflate at all.
+    New pairs are only committed once the archive has been processed, so a
+    failed or retried extraction never hides files it didn't deliver.
+    """
+
+    def __init__(self, cache):
+        self.cache, self.pending = cache, set()
+
+    def __call__(self, size, crc):
+        key = f"{size}:{crc:08x}"
+        if key in self.pending or self.cache.has_member(key):
+            return True
+        self.pending.add(key)
+        return False
+
+    def reset(self):
+        self.pending.clear()
+
+    def commit(self):
+        self.cache.add_members(self.pending)
+        self.pending = set()
+
+class StreamUnzipError(Exception):
+    """The archive needs its central directory (seekable file) to be extracted."""
+
+# What a broken archive (or member) can raise while it is extracted: the source is
+# marked done rather than retried every run. Network errors (requests' exceptions
+# subclass OSError) are re-raised ahead of these so they still get their retry.
+EXTRACT_ERRORS = (zipfile.BadZipFile, StreamUnzipError, OSError, zlib.error, ValueError)
+
+class ZipStream:
+    """Forward-only reader over response chunks that can give back the tail of its last read."""
+
+    def __init__(self, chunks, progress=None):
+        self.chunks, self.progress = iter(chunks), progress
+        self.buf, self.pos, self.nbytes = b"", 0, 0
+
+    def read(self, n):
+        if self.pos >= len(self.buf):
+            self.buf, self.pos = next(self.chunks, b""), 0
+            self.nbytes += len(self.buf)
+            if self.progress:
+                self.progress(len(self.buf))
+        out = self.buf[self.pos:self.pos + n]
+        self.pos += len(out)
+        return out
+
+    def read_full(self, n):
+        """Up to n bytes, short only at the end of the stream."""
+        parts = []
+        while n:
+            chunk = self.read(n)
+            if not chunk:
+                break
+            parts.append(chunk)
+            n -= len(chunk)
+        return b"".join(parts)
+
+    def read_exact(self, n):
+        data = self.read_full(n)
+        if len(data) < n:
+            raise zipfile.BadZipFile("truncated zip stream")
+        return data
+
+    def unread(self, tail):
+        self.pos -= len(tail)
+
+def _zip64_sizes(extra):
+    i = 0
+    while i + 4 <= len(extra):
+        hid, hlen = struct.unpack_from("<HH", extra, i)
+        if hid == 1 and hlen >= 16:
+            return struct.unpack_from("<QQ", extra, i + 4)  # usize, csize
+        i += 4 + hlen
+    return None
+
+def _copy_member(stream, out, method, csize):
+    """Copy (out=None: skip) one member's data; csize=None means deflate runs to its own end."""
+    crc = 0
+    if method == 0:
+        while csize:
+            chunk = stream.read(min(csize, UNZIP_CHUNK))
+            if not chunk:
+                raise zipfile.BadZipFile("truncated zip stream")
+            csize -= len(chunk)
+            if out:
+                crc = fast_zlib.crc32(chunk, crc)
+                out.write(chunk)
+        return crc
+    # Running to the stream's own end needs exact unused_data, which isal drops across calls
+    d = (zlib if csize is None else fast_zlib).decompressobj(-15)
+    while not d.eof:
+        chunk = stream.read(UNZIP_CHUNK if csize is None else min(csize, UNZIP_CHUNK))
+        if not chunk:
+            raise zipfile.BadZipFile("truncated zip stream")
+        if csize is not None:
+            csize -= len(chunk)
+        data = d.decompress(chunk)
+        if out:
+            crc = fast_zlib.crc32(data, crc)
+            out.write(data)
+    if d.unused_data:
+        stream.unread(d.unused_data)
+    return crc
+
+def stream_unzip(stream, dest, exts=VALID_EXT, skip=None):
+    """Extract members with a matching suffix by walking local headers in stream order,
+    so the archive itself never touches disk. skip(size, crc) can veto members whose
+    header carries both. Returns the number of files written."""
+    count = 0
+    while True:
+        head = stream.read_full(4)
+        if head != b"PK\x03\x04":
+            if count == 0 and head[:2] != b"PK":
+                raise zipfile.BadZipFile("not a zip stream")
+            return count  # central directory: every member has been seen
+        hdr = head + stream.read_exact(_LOCAL_HEADER.size - 4)
+        _, _, flags, method, _, _, crc, csize, usize, nlen, xlen = _LOCAL_HEADER.unpack(hdr)
+        raw_name = stream.read_exact(nlen)
+        extra = stream.read_exact(xlen)
+        zip64 = _zip64_sizes(extra)
+        if zip64 and 0xFFFFFFFF in (csize, usize):
+            usize, csize = zip64
+        name = raw_name.decode("utf-8" if flags & 0x800 else "cp437")
+        parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".", "..")]
+        descriptor = flags & 0x08
+        # Sizes are unknown until the end of a descriptor member, so those can't be size-filtered
+        wanted = (bool(parts) and not name.endswith("/") and (descriptor or usize >= 100)
+                  and os.path.splitext(name)[1].lower() in exts)
+        if wanted and skip and not descriptor and skip(usize, crc):
+            wanted = False
+        if descriptor and method != 8:
+            raise StreamUnzipError(f"{name}: size only known from the central directory")
+        if flags & 0x01 or method not in (0, 8):
+            if wanted or descriptor:
+                raise StreamUnzipError(f"{name}: unsupported method {method} (flags {flags:#x})")
+            _copy_member(stream, None, 0, csize)
+            continue
+        if not wanted:
+            # A known csize is skipped as raw bytes; only descriptor members must be
+            # inflated, since the deflate stream is the only way to find their end
+            if descriptor:
+                _copy_member(stream, None, method, None)
+            else:
+                _copy_member(stream, None, 0, csize)
+        else:
+            target = os.path.join(dest, *parts)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, "wb") as out:
+                got = _copy_member(stream, out, method, None if descriptor else csize)
+        if descriptor:
+            sig = stream.read_exact(4)
+            if sig == b"PK\x07\x08":
+                sig = stream.read_exact(4)
+            crc = struct.unpack("<L", sig)[0]
+            stream.read_exact(16 if zip64 else 8)
+        if wanted:
+            if got != crc:
+                os.unlink(target)
+                raise zipfile.BadZipFile(f"bad CRC for {name}")
+            count += 1
+
+_inflate_slots = threading.BoundedSemaphore(os.cpu_count() or 4)
+
+def extract_audio_members(open_zip, dest, exts=VALID_EXT, skip=None):
+    """Extract only members with a matching suffix and at least 100 bytes, spread over a few threads.
+    open_zip() must return a fresh ZipFile; ZipFile isn't thread-safe, so each
+    worker reads through its own handle. Returns the number of members."""
+    with open_zip() as zf:
+        members = [i for i in zf.infolist()
+                   if not i.is_dir() and i.file_size >= 100
+                   and os.path.splitext(i.filename)[1].lower() in exts
+                   and not (skip and skip(i.file_size, i.CRC))]
+    local, handles = threading.local(), []
+
+    def extract(info):
+        if not hasattr(local, "zf"):
+            local.zf = open_zip()
+            handles.append(local.zf)
+        with _inflate_slots:
+            try:
+                local.zf.extract(info, dest)
+            except FileExistsError:  # two workers raced to create the same parent dir
+                local.zf.extract(info, dest)
+
+    # Largest first: a big member started last would otherwise inflate alone at the end
+    members.sort(key=lambda i: i.compress_size, reverse=True)
+    try:
+        with ThreadPoolExecutor(max_workers=EXTRACT_THREADS) as exc:
+            list(exc.map(extract, members))
+    finally:
+        for zf in handles:
+            zf.close()
+    return len(members)
+
+# Finished extract dirs are renamed aside (so the name is free again at once)
+# and deleted by one background worker while the next download runs
+_trash = ThreadPoolExecutor(max_workers=1)
+_trash_ids = itertools.count()
+
+def discard_tree(path):
+    trash = f"{path}.trash{next(_trash_ids)}"
+    try:
+        os.rename(path, trash)
+    except OSError:
+        return
+    _trash.submit(shutil.rmtree, trash, True)
+
+def save_response(r, path, progress=None):
+    """Write a streamed response body to path through one reused buffer."""
+    r.raw.decode_content = True
+    buf = bytearray(UNZIP_CHUNK)
+    view = memoryview(buf)
+    with open(path, "wb") as f:
+        while True:
+            # Raw reads skip the wrapping iter_content does: map urllib3's errors to
+            # the requests ones callers catch, as iter_content would
+            try:
+                n = r.raw.readinto(buf)
+            except ProtocolError as e:
+                raise requests.exceptions.ChunkedEncodingError(e)
+            except DecodeError as e:
+                raise requests.exceptions.ContentDecodingError(e)
+            except ReadTimeoutError as e:
+                raise requests.exceptions.ConnectionError(e)
+            if not n:
+                break
+            f.write(view[:n])
+            if progress:
+                progress(n)
+
+def extract_zip_response(session, r, extract_dir, spool_path, desc, skip=None, received=None):
+    """Extract a zip response's audio members into extract_dir while it downloads.
+    Falls back to spooling the archive to disk when it cannot be streamed; then
+    received() (if given) runs once the whole archive is in hand, before extraction.
+    Returns the archive size in bytes."""
+    cl = int(r.headers.get("Content-Length", "0"))
+    with tqdm(total=cl, unit='iB', unit_scale=True, desc=desc, leave=False) as t:
+        stream = ZipStream(r.iter_content(UNZIP_CHUNK), t.update)
+        try:
+            stream_unzip(stream, extract_dir, skip=skip)
+            return stream.nbytes
+        except StreamUnzipError as e:
+            logging.info(f"{desc}: {e}; downloading whole archive")
+    r.close()
+    shutil.rmtree(extract_dir, ignore_errors=True)
+    if skip:
+        skip.reset()
+    r = session.get(r.url, stream=True, timeout=300)
+    r.raise_for_status()
+    cl = int(r.headers.get("Content-Length", "0"))
+    if 0 < cl <= SPOOL_MEMORY_MAX:
+        # Small enough to hold: each extract thread gets its own BytesIO over the same bytes
+        data = r.content
+        if received:
+            received()
+        extract_audio_members(lambda: zipfile.ZipFile(io.BytesIO(data)), extract_dir, skip=skip)
+        return len(data)
+    try:
+        save_response(r, spool_path)
+        if received:
+            received()
+        extract_audio_members(lambda: zipfile.ZipFile(spool_path), extract_dir, skip=skip)
+        return spool_path.stat().st_size
+    finally:
+        spool_path.unlink(missing_ok=True)
+
+def gh_wait_for_reset(r):
+    """Sleep until the rate-limit window resets when a GitHub response says it's used up."""
+    if r.headers.get("X-RateLimit-Remaining") == "0":
+        reset = int(r.headers.get("X-RateLimit-Reset", "0"))
+        time.sleep(min(max(reset - time.time(), 0) + 1, 60))
+
+def gh_api_get(session, cache, url, slim=lambda j: j):
+    """
+    GET a GitHub API url with If-None-Match against the ETag from the last run.
+    A 304 doesn't count against the rate limit and reuses the stored body, which
+    is kept as slim(json) so the cache file only holds the fields we read.
+    Returns (status, body); body is None unless status is 200 or 304.
+    """
+    cached = cache.api_entry(url)
+    headers = {"Accept": "application/vnd.github+json"}
+    if cached:
+        headers["If-None-Match"] = cached[0]
+    r = session.get(url, timeout=30, headers=headers)
+    gh_wait_for_reset(r)
+    if r.status_code == 304 and cached:
+        return 304, cached[1]
+    if r.status_code != 200:
+        return r.status_code, None
+    body = slim(r.json())
+    if r.headers.get("ETag"):
+        cache.set_api_entry(url, r.headers["ETag"], body)
+    return 200, body
+
+def repo_seen(cache, repo):
+    """True if repo was downloaded under any of the historical cache prefixes."""
+    owner, _, name = repo.partition("/")
+    return cache.seen_any(*(f"{p}_{owner}_{name}" for p in ("v3_gh", "mega_gh", "gh", "blitz_gh")))
+
+def download_repo(session, cache, repo, branch=None):
+    """branch: default branch from gh_graphql_batch, if known (skips the main/master probing)."""
     if "/" not in repo:
         return 0
     owner, name = repo.split("/", 1)
     cache_key = f"v3_gh_{owner}_{name}"
-    # Check all historical prefixes so we don't re-download
-    if cache.seen_any(cache_key, f"mega_gh_{owner}_{name}", f"gh_{owner}_{name}", f"blitz_gh_{owner}_{name}"):
+    if repo_seen(cache, repo):
         return 0
 
-    tmp_dir = Path("/tmp/mega_gh")
+    tmp_dir = Path("/tmp/mega_gh") / owner  # repos run in parallel; names repeat across owners
     tmp_dir.mkdir(parents=True, exist_ok=True)
 
-    for branch in ["main", "master"]:
+    branches = [branch] if branch else ["main", "master"]
+    for branch in branches:
         zip_url = f"https://github.com/{owner}/{name}/archive/refs/heads/{branch}.zip"
         zip_path = tmp_dir / f"{name}.zip"
+        # After --fresh the archive's ETag from the last extraction still stands:
+        # a 304 means the branch hasn't moved and its files are already organized
+        cached = cache.api_entry(zip_url)
+        headers = {"If-None-Match": cached[0]} if cached else None
         try:
-            r = session.get(zip_url, stream=True, timeout=300)
-            if r.status_code == 404:
-                continue
-            r.raise_for_status()
-            cl = int(r.headers.get("Content-Length", "0"))
-            if cl > 600 * 1024 * 1024: # Increased limit for massive expansions
-                cache.mark(cache_key)
-                return 0
-            with open(zip_path, "wb") as f:
-                with tqdm(total=cl, unit='iB', unit_scale=True, desc=f"Downloading {name}", leave=False) as t:
-                    for chunk in r.iter_content(1024 * 1024):
-                        f.write(chunk)
-                        t.update(len(chunk))
-            logging.info(f"Downloaded {owner}/{name} ({zip_path.stat().st_size/1e6:.1f}MB)")
-            extract_dir = tmp_dir / name
-            try:
-                with zipfile.ZipFile(zip_path) as zf:
-                    zf.extractall(extract_dir)
-            except:
-                zip_path.unlink(missing_ok=True)
-                cache.mark(cache_key)
-                return 0
+            with HostLease(zip_url) as lease:
+                # stream=True: status and Content-Length arrive before any of the body,
+                # so a GET decides as early as a HEAD would, without a second round trip
+                r = session.get(zip_url, stream=True, timeout=300, headers=headers)
+                if r.status_code == 404:
+                    r.close()
+                    continue
+                if r.status_code == 304:
+                    r.close()
+                    cache.mark(cache_key)
+                    return 0
+                r.raise_for_status()
+                etag = r.headers.get("ETag")
+                cl = int(r.headers.get("Content-Length", "0"))
+                if cl > 600 * 1024 * 1024: # Increased limit for massive expansions
+                    r.close()
+                    cache.mark(cache_key)
+                    return 0
+                extract_dir = tmp_dir / name
+                skip = MemberFilter(cache)
+                try:
+                    size = extract_zip_response(session, r, extract_dir, zip_path, f"Downloading {name}", skip, lease.release)
+                except requests.exceptions.RequestException:
+                    shutil.rmtree(extract_dir, ignore_errors=True)
+                    raise
+                except EXTRACT_ERRORS as e:
+                    logging.warning(f"Skip {repo}: {e}")
+                    shutil.rmtree(extract_dir, ignore_errors=True)
+                    cache.mark(cache_key)
+                    return 0
+            logging.info(f"Downloaded {owner}/{name} ({size/1e6:.1f}MB)")
             file_count = 0
-            for root, dirs, files in os.walk(extract_dir):
-                dirs[:] = [d for d in dirs if not d.startswith((".", "__"))]
-                for fn in files:
-                    if Path(fn).suffix.lower() not in VALID_EXT:
-                        continue
-                    src = Path(root) / fn
-                    try:
-                        if not is_valid(src) or cache.is_dup(src):
-                            continue
-                        ctx = f"{name}/{os.path.relpath(root, extract_dir)}/{fn}"
-                        organize_file(src, ctx)
+            for root, entry in iter_valid_audio(extract_dir):
+                try:
+                    ctx = f"{name}/{os.path.relpath(root, extract_dir)}/{entry.name}"
+                    if organize_new(cache, entry.path, ctx):
                         file_count += 1
-                    except:
-                        pass
+                except:
+                    pass
             logging.info(f"  → {file_count} files from {name}")
+            skip.commit()
+            if etag:
+                cache.set_api_entry(zip_url, etag, None)
             cache.mark(cache_key)
-            cache.save()
-            shutil.rmtree(extract_dir, ignore_errors=True)
-            zip_path.unlink(missing_ok=True)
+            discard_tree(extract_dir)
             return file_count
         except requests.exceptions.RequestException as e:
-            if branch == "master":
+            if branch == branches[-1]:
                 logging.warning(f"Skip {repo}: {e}")
                 cache.mark(cache_key)
                 return 0
@@ -935,18 +1779,19 @@ def download_releases(session, cache, owner, repo_name):
     if cache.seen_any(cache_key, f"mega_rel_{owner}_{repo_name}", f"rel_{owner}_{repo_name}", f"blitz_rel_{owner}_{repo_name}"):
         return 0
     try:
-        r = session.get(
-            f"https://api.github.com/repos/{owner}/{repo_name}/releases",
-            timeout=30, headers={"Accept": "application/vnd.github+json"}
-        )
-        if r.status_code in (404, 403):
+        status, releases = gh_api_get(
+            session, cache, f"https://api.github.com/repos/{owner}/{repo_name}/releases",
+            lambda j: [{"assets": [{"name": a["name"], "browser_download_url": a["browser_download_url"]}
+                                   for a in rel.get("assets", [])]} for rel in j[:10]])
+        if status in (404, 403):
             cache.mark(cache_key)
             return 0
-        r.raise_for_status()
+        if releases is None:
+            raise requests.HTTPError(f"releases API returned {status}")
         file_count = 0
-        tmp = Path("/tmp/mega_rel")
+        tmp = Path("/tmp/mega_rel") / owner / repo_name  # repos run in parallel; asset names repeat
         tmp.mkdir(parents=True, exist_ok=True)
-        for rel in r.json()[:10]:
+        for rel in releases:
             for asset in rel.get("assets", []):
                 url = asset["browser_download_url"]
                 name = asset["name"]
@@ -955,106 +1800,204 @@ def download_releases(session, cache, owner, repo_name):
                     continue
                 if cache.seen(url):
                     continue
+                tp = tmp / name
+                xd = tmp / Path(name).stem
                 try:
-                    dr = session.get(url, stream=True, timeout=300)
-                    dr.raise_for_status()
-                    tp = tmp / name
-                    with open(tp, "wb") as f:
-                        for chunk in dr.iter_content(1024 * 1024):
-                            f.write(chunk)
+                    skip = MemberFilter(cache)
+                    with HostLease(url) as lease:
+                        dr = session.get(url, stream=True, timeout=300)
+                        dr.raise_for_status()
+                        if ext == ".zip":
+                            try:
+                                extract_zip_response(session, dr, xd, tp, f"Release: {name}", skip, lease.release)
+                            except requests.exceptions.RequestException:
+                                raise
+                            except EXTRACT_ERRORS:
+                                shutil.rmtree(xd, ignore_errors=True)
+                        else:
+                            save_response(dr, tp)
                     if ext == ".zip":
-                        try:
-                            xd = tmp / Path(name).stem
-                            with zipfile.ZipFile(tp) as zf:
-                                zf.extractall(xd)
-                            for root, dirs, files in os.walk(xd):
-                                dirs[:] = [d for d in dirs if not d.startswith((".", "__"))]
-                                for fn in files:
-                                    if Path(fn).suffix.lower() not in VALID_EXT:
-                                        continue
-                                    src = Path(root) / fn
-                                    if is_valid(src) and not cache.is_dup(src):
-                                        organize_file(src, f"rel/{repo_name}/{fn}")
-                                        file_count += 1
-                            shutil.rmtree(xd, ignore_errors=True)
-                        except:
-                            pass
-                    elif is_valid(tp) and not cache.is_dup(tp):
-                        organize_file(tp, f"rel/{repo_name}/{name}")
+                        for _, entry in iter_valid_audio(xd):
+                            if organize_new(cache, entry.path, f"rel/{repo_name}/{entry.name}"):
+                                file_count += 1
+                        skip.commit()
+                    elif is_valid(tp) and organize_new(cache, tp, f"rel/{repo_name}/{name}"):
                         file_count += 1
-                    tp.unlink(missing_ok=True)
                     cache.mark(url)
                 except:
                     pass
+                finally:
+                    discard_tree(xd)
+                    tp.unlink(missing_ok=True)
         logging.info(f"Releases {owner}/{repo_name}: {file_count} files")
         cache.mark(cache_key)
-        cache.save()
         return file_count
     except Exception as e:
         logging.warning(f"Releases {owner}/{repo_name}: {e}")
         cache.mark(cache_key)
         return 0
 
+def interleave_hosts(items):
+    """Round-robin (url, ...) items across hosts. A pool fed in list order would
+    park its first wave of threads on one busy host's slots; interleaved, every
+    host starts at once and each keeps reusing its own keep-alive pool. (Sorting by
+    host would not add reuse, since pools are per host whatever the order, but would
+    queue each host's run behind its PER_HOST_LIMIT slots.)"""
+    by_host = defaultdict(list)
+    for item in items:
+        by_host[urlparse(item[0]).hostname].append(item)
+    return [item for wave in itertools.zip_longest(*by_host.values()) for item in wave if item is not None]
+
+def live_direct_zips(session, cache):
+    """DIRECT_ZIPS minus repeats, cached URLs and ones a parallel HEAD says are gone,
+    interleaved by host."""
+    todo, urls = [], set()
+    for url, name in DIRECT_ZIPS:
+        if url not in urls and not cache.seen(url):
+            urls.add(url)
+            todo.append((url, name))
+    todo = interleave_hosts(todo)
+
+    def head(url):
+        try:
+            return session.head(url, timeout=15, allow_redirects=True).status_code
+        except requests.RequestException:
+            return None
+
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as exc:
+        codes = list(exc.map(lambda u: per_host(u, head, u), [u for u, _ in todo]))
+    live = []
+    for (url, name), code in zip(todo, codes):
+        if code in (404, 410):
+            cache.mark(url)
+        elif code is not None:
+            live.append((url, name))
+    if len(live) < len(todo):
+        logging.info(f"Direct: skipping {len(todo) - len(live)} dead URLs")
+    return live
+
+
+class RangeReader(io.RawIOBase):
+    """Seekable read-only view of a remote file over HTTP Range requests, so
+    zipfile can read the central directory and pick members without
+    fetching the whole archive."""
+
+    def __init__(self, session, url, size):
+        self.session, self.url, self.size, self.pos = session, url, size, 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.pos
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self.pos, io.SEEK_END: self.size}[whence]
+        self.pos = max(0, base + offset)
+        return self.pos
+
+    def readinto(self, b):
+        if self.pos >= self.size:
+            return 0
+        end = min(self.pos + len(b), self.size) - 1
+        r = self.session.get(self.url, timeout=120, headers={
+            "Range": f"bytes={self.pos}-{end}", "Accept-Encoding": "identity"})
+        if r.status_code != 206:
+            raise OSError(f"range request returned {r.status_code}")
+        n = len(r.content)
+        b[:n] = r.content
+        self.pos += n
+        return n
+
+
+def extract_remote_zip(session, url, size, dest, skip=None):
+    """Extract only audio members of a remote zip. False if ranges don't work."""
+    def open_zip():
+        return zipfile.ZipFile(io.BufferedReader(RangeReader(session, url, size), buffer_size=1024 * 1024))
+
+    try:
+        extract_audio_members(open_zip, dest, skip=skip)
+        return True
+    except (OSError, zipfile.BadZipFile, requests.RequestException) as e:
+        logging.info(f"Ranged zip read failed, downloading whole: {e}")
+        shutil.rmtree(dest, ignore_errors=True)
+        if skip:
+            skip.reset()
+        return False
+
+
 def download_direct_zip(session, cache, url, name):
     if cache.seen(url):
         return 0
-    tmp = Path("/tmp/mega_direct")
-    tmp.mkdir(parents=True, exist_ok=True)
+    Path("/tmp/mega_direct").mkdir(parents=True, exist_ok=True)
+    # One dir per URL: downloads run in parallel and names/filenames can repeat
+    tmp = Path(tempfile.mkdtemp(prefix="direct_", dir="/tmp/mega_direct"))
     try:
-        r = session.get(url, stream=True, timeout=300, allow_redirects=True)
-        if r.status_code in (404, 403, 410):
-            cache.mark(url)
-            return 0
-        r.raise_for_status()
-        cd = r.headers.get("Content-Disposition", "")
-        if "filename=" in cd:
-            fn_match = re.findall(r'filename="?([^";\n]+)', cd)
-            fn = fn_match[0] if fn_match else f"{name}.zip"
-        else:
-            fn = unquote(urlparse(url).path.split("/")[-1]) or f"{name}.zip"
-        download_path = tmp / fn
-        cl = int(r.headers.get("Content-Length", "0"))
-        with open(download_path, "wb") as f:
-            with tqdm(total=cl, unit='iB', unit_scale=True, desc=f"Direct: {name}", leave=False) as t:
-                for chunk in r.iter_content(1024 * 1024):
-                    f.write(chunk)
-                    t.update(len(chunk))
-        logging.info(f"Direct: {name} ({download_path.stat().st_size/1e6:.1f}MB)")
-        file_count = 0
-        if download_path.suffix.lower() == ".zip":
-            extract_dir = tmp / name
-            try:
-                with zipfile.ZipFile(download_path) as zf:
-                    zf.extractall(extract_dir)
-            except zipfile.BadZipFile:
-                download_path.unlink(missing_ok=True)
+        with HostLease(url) as lease:
+            r = session.get(url, stream=True, timeout=300, allow_redirects=True)
+            if r.status_code in (404, 403, 410):
+                r.close()
                 cache.mark(url)
                 return 0
-            for root, dirs, files in os.walk(extract_dir):
-                dirs[:] = [d for d in dirs if not d.startswith((".", "__"))]
-                for fn in files:
-                    if Path(fn).suffix.lower() not in VALID_EXT:
-                        continue
-                    src = Path(root) / fn
-                    try:
-                        if is_valid(src) and not cache.is_dup(src):
-                            organize_file(src, f"{name}/{os.path.relpath(root, extract_dir)}/{fn}")
-                            file_count += 1
-                    except:
-                        pass
-            shutil.rmtree(extract_dir, ignore_errors=True)
-            download_path.unlink(missing_ok=True)
+            r.raise_for_status()
+            cd = r.headers.get("Content-Disposition", "")
+            if "filename=" in cd:
+                fn_match = _CD_FILENAME_RE.findall(cd)
+                fn = fn_match[0] if fn_match else f"{name}.zip"
+            else:
+                fn = unquote(urlparse(url).path.split("/")[-1]) or f"{name}.zip"
+            download_path = tmp / fn
+            extract_dir = tmp / name
+            cl = int(r.headers.get("Content-Length", "0"))
+            ranged = (download_path.suffix.lower() == ".zip" and cl > REMOTE_ZIP_MIN
+                      and r.headers.get("Accept-Ranges") == "bytes"
+                      and "Content-Encoding" not in r.headers)
+            skip = MemberFilter(cache)
+            if ranged:
+                r.close()
+                ranged = extract_remote_zip(session, r.url, cl, extract_dir, skip)
+                if not ranged:
+                    r = session.get(url, stream=True, timeout=300, allow_redirects=True)
+                    r.raise_for_status()
+            if ranged:
+                logging.info(f"Direct: {name} (ranged read of {cl/1e6:.1f}MB zip)")
+            elif download_path.suffix.lower() == ".zip":
+                try:
+                    size = extract_zip_response(session, r, extract_dir, download_path, f"Direct: {name}", skip, lease.release)
+                except requests.exceptions.RequestException:
+                    shutil.rmtree(extract_dir, ignore_errors=True)
+                    raise
+                except EXTRACT_ERRORS as e:
+                    logging.warning(f"Direct {name}: {e}")
+                    shutil.rmtree(extract_dir, ignore_errors=True)
+                    cache.mark(url)
+                    return 0
+                logging.info(f"Direct: {name} ({size/1e6:.1f}MB)")
+            else:
+                with tqdm(total=cl, unit='iB', unit_scale=True, desc=f"Direct: {name}", leave=False) as t:
+                    save_response(r, download_path, t.update)
+                logging.info(f"Direct: {name} ({download_path.stat().st_size/1e6:.1f}MB)")
+        file_count = 0
+        if download_path.suffix.lower() == ".zip":
+            for root, entry in iter_valid_audio(extract_dir):
+                try:
+                    if organize_new(cache, entry.path, f"{name}/{os.path.relpath(root, extract_dir)}/{entry.name}"):
+                        file_count += 1
+                except:
+                    pass
+            skip.commit()
             cache.mark(url)
-            cache.save()
             return file_count
-        elif is_valid(download_path) and not cache.is_dup(download_path):
-            organize_file(download_path, f"{name}/{fn}")
-            download_path.unlink(missing_ok=True)
+        elif is_valid(download_path) and organize_new(cache, download_path, f"{name}/{fn}"):
             cache.mark(url)
-            cache.save()
             return 1
     except Exception as e:
         logging.warning(f"Direct {name}: {e}")
+    finally:
+        discard_tree(tmp)
     cache.mark(url)
     return 0
 
@@ -1106,29 +2049,20 @@ def download_tonehunt(session, cache):
                     dr.raise_for_status()
                     cl = int(dr.headers.get("Content-Length", "0"))
                     dl_path = tmp_dir / filename
-                    with open(dl_path, "wb") as f:
-                        with tqdm(total=cl, unit='iB', unit_scale=True, desc=f"ToneHunt: {model_name[:15]}", leave=False) as t:
-                            for chunk in dr.iter_content(1024 * 1024):
-                                f.write(chunk)
-                                t.update(len(chunk))
+                    with tqdm(total=cl, unit='iB', unit_scale=True, desc=f"ToneHunt: {model_name[:15]}", leave=False) as t:
+                        save_response(dr, dl_path, t.update)
                             
                     if filename.lower().endswith(".zip"):
                         ex_dir = tmp_dir / Path(filename).stem
                         try:
-                            with zipfile.ZipFile(dl_path) as zf:
-                                zf.extractall(ex_dir)
-                            for root, _, files in os.walk(ex_dir):
-                                for fn in files:
-                                    if fn.lower().endswith(".nam"):
-                                        src = Path(root) / fn
-                                        if is_valid(src) and not cache.is_dup(src):
-                                            organize_file(src, f"ToneHunt/{model_name}/{fn}")
-                                            file_count += 1
-                            shutil.rmtree(ex_dir, ignore_errors=True)
+                            extract_audio_members(lambda: zipfile.ZipFile(dl_path), ex_dir, exts={".nam"})
+                            for _, entry in iter_valid_audio(ex_dir, exts={".nam"}, skip_dirs=()):
+                                if organize_new(cache, entry.path, f"ToneHunt/{model_name}/{entry.name}"):
+                                    file_count += 1
+                            discard_tree(ex_dir)
                         except:
                             pass
-                    elif is_valid(dl_path) and not cache.is_dup(dl_path):
-                        organize_file(dl_path, f"ToneHunt/{model_name}/{filename}")
+                    elif is_valid(dl_path) and organize_new(cache, dl_path, f"ToneHunt/{model_name}/{filename}"):
                         file_count += 1
                         
                     dl_path.unlink(missing_ok=True)
@@ -1139,11 +2073,17 @@ def download_tonehunt(session, cache):
             logging.warning(f"ToneHunt API error on page {page}: {e}")
             break
             
-    cache.save()
+    cache.flush()
     logging.info(f"✅ ToneHunt API yields: {file_count} new NAM models")
     return file_count
 
 def github_search_discover(session, cache):
+    """
+    Repos matching the IR/NAM search queries that aren't in REPOS yet. With a token
+    the queries go out as a few batched GraphQL POSTs (which can't be conditional);
+    without one, each REST search sends If-None-Match via gh_api_get, so unchanged
+    results come back as free 304s.
+    """
     queries = [
         "impulse response guitar cabinet wav",
         "NAM neural amp modeler .nam",
@@ -1177,22 +2117,23 @@ def github_search_discover(session, cache):
     ]
     found = set()
     existing = set(REPOS)
+    hits = gh_graphql_search(session, queries)
     for q in queries:
         try:
-            r = session.get(
-                f"https://api.github.com/search/repositories?q={quote(q)}&sort=updated&per_page=30",
-                timeout=15, headers={"Accept": "application/vnd.github+json"}
-            )
-            if r.status_code != 200:
-                continue
-            for repo in r.json().get("items", []):
-                fn = repo["full_name"]
-                sz = repo.get("size", 0)
+            items = hits.get(q)
+            if items is None:
+                # REST fallback; rate-limit pacing happens in gh_api_get, only once the window is used up
+                _, result = gh_api_get(
+                    session, cache, f"https://api.github.com/search/repositories?q={quote(q)}&sort=updated&per_page=30",
+                    lambda j: {"items": [{"full_name": i["full_name"], "size": i.get("size", 0)} for i in j.get("items", [])]})
+                if result is None:
+                    continue
+                items = [(i["full_name"], i.get("size", 0)) for i in result["items"]]
+            for fn, sz in items:
                 if sz > 100 and fn not in existing and fn not in found:
                     found.add(fn)
         except:
             pass
-        time.sleep(1.5)
     logging.info(f"GitHub search discovered {len(found)} new repos")
     return list(found)[:50]
 
@@ -1202,7 +2143,7 @@ def generate_docs():
     cats = {}
     for ch in BASE_DIR.iterdir():
         if ch.is_dir() and not ch.name.startswith("."):
-            c = sum(1 for f in ch.iterdir() if f.is_file() and f.suffix.lower() in VALID_EXT)
+            c = sum(1 for f in ch.iterdir() if f.name.lower().endswith(VALID_ENDINGS) and f.is_file())
             if c > 0:
                 cats[ch.name] = c
                 total += c
@@ -1216,6 +2157,16 @@ def generate_docs():
     logging.info(f"Docs generated: {total:,} files")
     return total
 
+def iter_lsjson(stream):
+    """Yield rclone lsjson records one at a time instead of buffering the whole listing."""
+    if ijson is not None:
+        yield from ijson.items(stream, "item")
+        return
+    for line in stream:
+        line = line.strip().rstrip(b",")
+        if line and line not in (b"[", b"]"):
+            yield json.loads(line)
+
 def generate_catalog():
     """
     Generates a rich JSON catalog for the Web Explorer by scanning Remote Drive directly.
@@ -1226,66 +2177,78 @@ def generate_catalog():
     cmd = ["rclone", "lsjson", "-R", "--hash", "--no-mimetype", RCLONE_REMOTE]
     logging.info(f"  Running: {' '.join(cmd)}")
     
-    try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=300)
-        if result.returncode != 0:
-            logging.error(f"Rclone lsjson failed: {result.stderr}")
-            return 0
-            
-        params = json.loads(result.stdout)
-    except Exception as e:
-        logging.error(f"Failed to parse rclone output: {e}")
-        return 0
-
+    # Entries are parsed as rclone prints them; the raw listing is never held whole
     catalog = []
     stats = {"brands": {}, "types": {}, "tags": {}}
-    
-    for item in params:
-        if item.get("IsDir", False): continue # Skip directories
+    with tempfile.TemporaryFile() as err:
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=err, bufsize=1 << 20)
+        except OSError as e:
+            logging.error(f"Rclone lsjson failed: {e}")
+            return 0
+        # Same 300 s budget the old blocking run had: a stalled listing is killed,
+        # which ends the stream and fails the wait below
+        killer = threading.Timer(300, proc.kill)
+        killer.start()
+        try:
+            for item in iter_lsjson(proc.stdout):
+                if item.get("IsDir", False): continue # Skip directories
         
-        path = item["Path"]
-        name = item["Name"]
-        size = item["Size"]
-        # ModTime is usually in item["ModTime"]
+                path = item["Path"]
+                name = item["Name"]
+                size = item["Size"]
+                # ModTime is usually in item["ModTime"]
         
-        ext = Path(name).suffix.lower()
-        if ext not in VALID_EXT:
-            continue
+                low = name.lower()
+                if not low.endswith(VALID_ENDINGS):
+                    continue
             
-        # Enrich metadata
-        # We simulate the context tags based on the path
-        context = path.replace("/", " ").replace("_", " ")
-        full_text = (context + " " + name).lower()
+                # Enrich metadata
+                # We simulate the context tags based on the path
+                context = path.replace("/", " ").replace("_", " ")
+                full_text = (context + " " + name).lower()
         
-        # Detect Brand
-        brand = _match(full_text, BRANDS) or "Other"
-        stats["brands"][brand] = stats["brands"].get(brand, 0) + 1
+                # Detect Brand
+                brand = _match(full_text, _BRAND_RE) or "Other"
+                stats["brands"][brand] = stats["brands"].get(brand, 0) + 1
         
-        # Detect Type
-        ftype = "NAM" if ext == ".nam" else "IR"
-        if "bass" in full_text or "bajo" in full_text: ftype = "Bass IR"
-        elif "acoust" in full_text: ftype = "Acoustic IR"
-        stats["types"][ftype] = stats["types"].get(ftype, 0) + 1
+                # Detect Type and Tags (one regex pass)
+                hits = _catalog_mask(full_text)
+                ftype = "NAM" if low.endswith(".nam") else "IR"
+                if hits & 1: ftype = "Bass IR"
+                elif hits & 2: ftype = "Acoustic IR"
+                stats["types"][ftype] = stats["types"].get(ftype, 0) + 1
         
-        # Detect Tags
-        tags = []
-        if "clean" in full_text: tags.append("Clean")
-        if "crunch" in full_text: tags.append("Crunch")
-        if "high gain" in full_text or "metal" in full_text or "dist" in full_text: tags.append("High Gain")
-        if "fuzz" in full_text: tags.append("Fuzz")
-        if "cab" in full_text: tags.append("Cab")
-        if "pedal" in full_text: tags.append("Pedal")
+                tags = [tag for i, tag in _CATALOG_TAGS if hits >> i & 1]
         
-        entry = {
-            "id": hashlib.md5(path.encode("utf-8")).hexdigest()[:8],
-            "n": name,                # Name (shortened key for JSON size)
-            "p": path,                # Path
-            "b": brand,               # Brand
-            "t": ftype,               # Type
-            "s": size,                # Size bytes
-            "tag": tags               # Tags
-        }
-        catalog.append(entry)
+                entry = {
+                    "id": hashlib.blake2s(path.encode("utf-8"), digest_size=4).hexdigest(),
+                    "n": name,                # Name (shortened key for JSON size)
+                    "p": path,                # Path
+                    "b": brand,               # Brand
+                    "t": ftype,               # Type
+                    "s": size,                # Size bytes
+                    "tag": tags               # Tags
+                }
+                catalog.append(entry)
+        except LSJSON_ERRORS as e:
+            parse_error = e
+        else:
+            parse_error = None
+        finally:
+            # Closing the pipe early makes rclone exit on EPIPE, so the wait is bounded
+            proc.stdout.close()
+            proc.wait()
+            killer.cancel()
+        # A failed or killed rclone also cuts the JSON short: report it first
+        if proc.returncode != 0:
+            err.seek(0)
+            reason = "timed out after 300s" if proc.returncode == -signal.SIGKILL else err.read().decode(errors='replace')
+            logging.error(f"Rclone lsjson failed: {reason}")
+            return 0
+        if parse_error is not None:
+            logging.error(f"Failed to parse rclone output: {parse_error}")
+            return 0
 
     # Save to explorer/public/data/catalog.json
     # We assume the script runs in the root or we use an arg, but let's try to find the web dir
@@ -1294,11 +2257,13 @@ def generate_catalog():
     web_data_dir.mkdir(parents=True, exist_ok=True)
     
     out_file = web_data_dir / "catalog.json"
-    out_file.write_text(json.dumps({
+    payload = {
         "updated": time.strftime('%Y-%m-%d %H:%M UTC'),
         "stats": stats,
         "items": catalog
-    }, indent=None), "utf-8") # Minified for network speed
+    }
+    # Minified for network speed; orjson encodes straight to bytes
+    out_file.write_bytes(orjson.dumps(payload) if orjson else json.dumps(payload, separators=(",", ":")).encode())
     
     logging.info(f"✅ Catalog generated: {len(catalog)} items. Saved to {out_file}")
     return len(catalog)
@@ -1312,7 +2277,7 @@ def run_tier3(session, cache):
     logging.info("=" * 60)
     total = 0
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as exc:
-        f = {exc.submit(download_direct_zip, session, cache, u, n): n for u, n in DIRECT_ZIPS}
+        f = {exc.submit(download_direct_zip, session, cache, u, n): n for u, n in live_direct_zips(session, cache)}
         for future in as_completed(f):
             total += future.result()
     with ThreadPoolExecutor(max_workers=MAX_WORKERS) as exc:
@@ -1328,16 +2293,41 @@ def run_tier3(session, cache):
 # ============================================================
 # MAIN
 # ============================================================
+def write_stats(stats):
+    """Write .stats.json (indented for humans); orjson encodes straight to bytes."""
+    path = BASE_DIR / ".stats.json"
+    if orjson:
+        path.write_bytes(orjson.dumps(stats, option=orjson.OPT_INDENT_2))
+    else:
+        path.write_text(json.dumps(stats, indent=2), "utf-8")
+
+# Phase tiers can be combined ("github,direct") and always run in this order;
+# the others are whole runs of their own
+PHASE_TIERS = ("cleanup", "github", "releases", "direct", "search", "docs")
+SOLO_TIERS = ("validate", "rename", "catalog", "all", "tier3")
+
+def parse_tiers(value):
+    """--tier value -> list of tier names, e.g. "github,direct" -> ["github", "direct"]."""
+    tiers = list(dict.fromkeys(t.strip() for t in value.split(",") if t.strip()))
+    unknown = [t for t in tiers if t not in PHASE_TIERS + SOLO_TIERS]
+    if unknown or not tiers:
+        raise argparse.ArgumentTypeError(f"unknown tier: {', '.join(unknown) or repr(value)}")
+    solo = [t for t in tiers if t in SOLO_TIERS]
+    if solo and len(tiers) > 1:
+        raise argparse.ArgumentTypeError(f"{solo[0]} can't be combined with other tiers")
+    return tiers
+
 def main():
     parser = argparse.ArgumentParser(description="MEGA Downloader v3 — Clean + Expand")
-    parser.add_argument("--tier", default="all",
-                        choices=["cleanup", "github", "releases", "direct", "search", "docs", "validate", "rename", "catalog", "all", "tier3"])
+    parser.add_argument("--tier", default="all", type=parse_tiers,
+                        help=f"one of {', '.join(PHASE_TIERS + SOLO_TIERS)}, or a comma list of {', '.join(PHASE_TIERS)}")
     parser.add_argument("--output-dir", default="/tmp/ir_repository")
     parser.add_argument("--rclone-remote", default="")
     parser.add_argument("--fresh", action="store_true", help="Reset URL cache to re-download everything")
     args = parser.parse_args()
 
     global BASE_DIR, CACHE_FILE, LOG_FILE, RCLONE_REMOTE
+    run = lambda tier: tier in args.tier or "all" in args.tier
     BASE_DIR = Path(args.output_dir)
     CACHE_FILE = BASE_DIR / ".download_cache.json"
     LOG_FILE = BASE_DIR / ".download.log"
@@ -1348,13 +2338,23 @@ def main():
     session = make_session()
     cache = Cache()
 
+    # atexit only runs after every worker thread has finished its download, which a
+    # CI timeout won't wait for: on SIGTERM write the cache first, then leave at once
+    def on_sigterm(signum, frame):
+        cache.flush()
+        logging.warning("Terminated — cache saved")
+        logging.shutdown()
+        os._exit(128 + signum)
+    signal.signal(signal.SIGTERM, on_sigterm)
+
     if args.fresh:
+        # Only the URL set is dropped; the next autosave or phase-end flush writes
+        # it, so there is no extra full rewrite here
         cache.reset_for_expansion()
-        cache.save()
         logging.info("🔄 Cache reset — will re-download from all sources")
 
     logging.info("=" * 60)
-    logging.info(f"MEGA DOWNLOADER v3 | tier={args.tier} | out={BASE_DIR}")
+    logging.info(f"MEGA DOWNLOADER v3 | tier={','.join(args.tier)} | out={BASE_DIR}")
     logging.info(f"Repos: {len(REPOS)} | Releases: {len(RELEASE_REPOS)} | Direct ZIPs: {len(DIRECT_ZIPS)}")
     logging.info(f"Remote: {RCLONE_REMOTE}")
     logging.info("=" * 60)
@@ -1363,18 +2363,23 @@ def main():
     stats = {}
 
     # ---- CLEANUP ----
-    if args.tier in ("cleanup", "all"):
-        stats["cleanup_drive"] = cleanup_drive()
+    drive_pool = drive_cleanup = None
+    if run("cleanup"):
+        # The Drive prune is rclone waiting on the network and nothing local depends
+        # on it: let it run alongside the local phases, collect it before the summary
+        drive_pool = ThreadPoolExecutor(max_workers=1)
+        drive_cleanup = drive_pool.submit(cleanup_drive)
+        stats["cleanup_drive"] = None  # keeps its place in the stats order
         stats["cleanup_local"] = cleanup_local()
 
     # ---- VALIDATE ----
-    if args.tier == "validate":
+    if "validate" in args.tier:
         stats["cleanup_local"] = cleanup_local()
-        (BASE_DIR / ".stats.json").write_text(json.dumps(stats, indent=2), "utf-8")
+        write_stats(stats)
         return
 
     # ---- RENAME / REORGANIZE EXISTING ----
-    if args.tier == "rename":
+    if "rename" in args.tier:
         logging.info("━" * 60)
         logging.info("♻️  REORGANIZE / RENAME EXISTING FILES")
         logging.info("━" * 60)
@@ -1388,97 +2393,115 @@ def main():
             logging.error(f"Source directory {source_dir} does not exist!")
             return
 
-        for root, dirs, files in os.walk(source_dir):
-            for fn in files:
-                if Path(fn).suffix.lower() not in VALID_EXT:
+        # Destinations are planned here in walk order, so _1/_2 suffixes come out
+        # the same every run; only the link/copy work goes to the pool
+        with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+            futures = []
+            for root, entry in scan_files(str(source_dir), skip_dirs=()):
+                if not entry.name.lower().endswith(VALID_ENDINGS):
                     continue
-                
-                src = Path(root) / fn
-                
+
                 # Context is the relative path from source root
                 # e.g. "IR_Guitarra/Marshall/Pack_1/cabinets/file.wav"
-                rel_path = os.path.relpath(root, source_dir)
-                context = f"{rel_path}"
-                
+                context = os.path.relpath(root, source_dir)
+
                 # Use the new robust logic
-                organize_file(src, context)
+                dest = plan_dest(entry.path, context)
+                futures.append(executor.submit(place_file, entry.path, dest))
+
+            for future in as_completed(futures):
+                future.result()
                 renamed_count += 1
-                
                 if renamed_count % 1000 == 0:
-                    logging.info(f"  Processed {renamed_count} files...")
+                    logging.info("  Processed %d files...", renamed_count)
 
         stats["rename"] = renamed_count
         logging.info(f"✅ Reorganized {renamed_count} files into clean structure")
         return
 
+    # One pool for every download phase: threads start once (lazily, on the first
+    # submit) and are reused by each phase instead of being joined and respawned
+    executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="dl")
+
     # ---- GITHUB REPOS ----
-    if args.tier in ("github", "all"):
+    if run("github"):
         logging.info("━" * 60)
         logging.info(f"📦 GITHUB REPOS ({len(REPOS)} repos)")
         logging.info("━" * 60)
         phase_count = 0
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = {}
-            for repo in REPOS:
-                f = executor.submit(download_repo, session, cache, repo)
-                futures[f] = repo
-            for future in as_completed(futures):
-                repo = futures[future]
-                try:
-                    count = future.result()
-                    phase_count += count
-                    if count > 0:
-                        logging.info(f"  ✅ {repo}: {count} files")
-                except Exception as e:
-                    logging.warning(f"  ❌ {repo}: {e}")
+        # Done repos cost neither a GraphQL lookup nor a pool slot
+        todo = [r for r in REPOS if not repo_seen(cache, r)]
+        logging.info(f"{len(REPOS) - len(todo)} repos already downloaded")
+        branches = gh_graphql_batch(session, todo)
+        missing = [r for r, b in branches.items() if b is None]
+        if missing:
+            logging.info(f"Skipping {len(missing)} repos that are gone or empty")
+        futures = {}
+        for repo in todo:
+            if repo in branches and branches[repo] is None:
+                continue
+            f = executor.submit(download_repo, session, cache, repo, branches.get(repo))
+            futures[f] = repo
+        for future in as_completed(futures):
+            repo = futures[future]
+            try:
+                count = future.result()
+                phase_count += count
+                if count > 0:
+                    logging.info(f"  ✅ {repo}: {count} files")
+            except Exception as e:
+                logging.warning(f"  ❌ {repo}: {e}")
         stats["github"] = phase_count
         total_files += phase_count
         logging.info(f"GitHub phase: {phase_count} new files (total: {total_files})")
-        cache.save()
+        cache.flush()
 
     # ---- RELEASES ----
-    if args.tier in ("releases", "all"):
+    if run("releases"):
         logging.info("━" * 60)
         logging.info(f"📦 GITHUB RELEASES ({len(RELEASE_REPOS)} repos)")
         logging.info("━" * 60)
         phase_count = 0
+        futures = {}
         for owner, rp in RELEASE_REPOS:
+            f = executor.submit(download_releases, session, cache, owner, rp)
+            futures[f] = f"{owner}/{rp}"
+        for future in as_completed(futures):
             try:
-                count = download_releases(session, cache, owner, rp)
-                phase_count += count
+                phase_count += future.result()
             except Exception as e:
-                logging.warning(f"  ❌ {owner}/{rp}: {e}")
+                logging.warning(f"  ❌ {futures[future]}: {e}")
         stats["releases"] = phase_count
         total_files += phase_count
         logging.info(f"Releases phase: {phase_count} new files (total: {total_files})")
+        cache.flush()
 
     # ---- DIRECT ZIPS ----
-    if args.tier in ("direct", "all"):
+    if run("direct"):
         logging.info("━" * 60)
         logging.info(f"📦 DIRECT ZIPS ({len(DIRECT_ZIPS)} sources)")
         logging.info("━" * 60)
         phase_count = 0
-        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-            futures = {}
-            for url, name in DIRECT_ZIPS:
-                f = executor.submit(download_direct_zip, session, cache, url, name)
-                futures[f] = name
-            for future in as_completed(futures):
-                name = futures[future]
-                try:
-                    count = future.result()
-                    phase_count += count
-                    if count > 0:
-                        logging.info(f"  ✅ {name}: {count} files")
-                except Exception as e:
-                    logging.warning(f"  ❌ {name}: {e}")
+        futures = {}
+        for url, name in live_direct_zips(session, cache):
+            f = executor.submit(download_direct_zip, session, cache, url, name)
+            futures[f] = name
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                count = future.result()
+                phase_count += count
+                if count > 0:
+                    logging.info(f"  ✅ {name}: {count} files")
+            except Exception as e:
+                logging.warning(f"  ❌ {name}: {e}")
         stats["direct"] = phase_count
         total_files += phase_count
         logging.info(f"Direct phase: {phase_count} new files (total: {total_files})")
-        cache.save()
+        cache.flush()
 
     # ---- SEARCH DISCOVERY ----
-    if args.tier in ("search", "all"):
+    if run("search"):
         logging.info("━" * 60)
         logging.info("📦 GITHUB SEARCH AUTO-DISCOVERY")
         logging.info("━" * 60)
@@ -1486,39 +2509,51 @@ def main():
         try:
             new_repos = github_search_discover(session, cache)
             logging.info(f"Found {len(new_repos)} new repos via search")
-            with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-                futures = {}
-                for repo in new_repos:
-                    f = executor.submit(download_repo, session, cache, repo)
-                    futures[f] = repo
-                for future in as_completed(futures):
-                    repo = futures[future]
-                    try:
-                        count = future.result()
-                        phase_count += count
-                        if count > 0:
-                            logging.info(f"  🔍 {repo}: {count} files")
-                    except:
-                        pass
+            new_repos = [r for r in new_repos if not repo_seen(cache, r)]
+            branches = gh_graphql_batch(session, new_repos)
+            futures = {}
+            for repo in new_repos:
+                if repo in branches and branches[repo] is None:
+                    continue
+                f = executor.submit(download_repo, session, cache, repo, branches.get(repo))
+                futures[f] = repo
+            for future in as_completed(futures):
+                repo = futures[future]
+                try:
+                    count = future.result()
+                    phase_count += count
+                    if count > 0:
+                        logging.info(f"  🔍 {repo}: {count} files")
+                except Exception as e:
+                    logging.warning(f"  ❌ {repo}: {e}")
         except Exception as e:
             logging.error(f"Search error: {e}")
         stats["search"] = phase_count
         total_files += phase_count
         logging.info(f"Search phase: {phase_count} new files (total: {total_files})")
-        cache.save()
+        cache.flush()
+
+    executor.shutdown()
 
     # ---- DOCS ----
-    if args.tier in ("docs", "all"):
+    if run("docs"):
         stats["docs"] = generate_docs()
 
     # ---- CATALOG (WEB INDEX) ----
-    if args.tier == "catalog":
+    if "catalog" in args.tier:
         stats["catalog"] = generate_catalog()
         return
 
     # ---- FINAL CLEANUP ----
-    if args.tier == "all":
-        stats["final_cleanup"] = cleanup_local()
+    kept = None
+    if "all" in args.tier:
+        # The final cleanup already walks everything; its survivors feed the summary
+        kept = []
+        stats["final_cleanup"] = cleanup_local(kept)
+
+    if drive_cleanup:
+        stats["cleanup_drive"] = drive_cleanup.result()
+        drive_pool.shutdown(wait=True)
 
     # ---- SUMMARY ----
     logging.info("")
@@ -1529,14 +2564,20 @@ def main():
         logging.info(f"  {k}: {v}")
     logging.info(f"  NEW FILES THIS RUN: {total_files}")
     total_local = 0
-    for cat_dir in BASE_DIR.iterdir():
-        if cat_dir.is_dir() and not cat_dir.name.startswith("."):
-            count = sum(1 for f in cat_dir.rglob("*") if f.suffix.lower() in VALID_EXT)
-            if count > 0:
-                logging.info(f"  📁 {cat_dir.name}: {count}")
-                total_local += count
+    cat_dirs = [d for d in BASE_DIR.iterdir() if d.is_dir() and not d.name.startswith(".")]
+    if kept is not None:
+        per_cat = Counter(os.path.relpath(p, BASE_DIR).split(os.sep, 1)[0] for p in kept)
+        counts = [per_cat[d.name] for d in cat_dirs]
+    else:
+        # Category walks are independent; run them side by side, log in listing order
+        with ThreadPoolExecutor(max_workers=max(1, min(8, len(cat_dirs)))) as executor:
+            counts = list(executor.map(count_valid, cat_dirs))
+    for cat_dir, count in zip(cat_dirs, counts):
+        if count > 0:
+            logging.info("  📁 %s: %d", cat_dir.name, count)
+            total_local += count
     logging.info(f"  📁 TOTAL LOCAL: {total_local}")
-    (BASE_DIR / ".stats.json").write_text(json.dumps(stats, indent=2), "utf-8")
+    write_stats(stats)
     logging.info("=" * 60)
     logging.info("🏁 MEGA DOWNLOAD v3 COMPLETE!")
     logging.info("=" * 60)
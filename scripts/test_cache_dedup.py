@@ -0,0 +1,35 @@
+"""Cross-run dedup: a file seen on one run is a dup on the next.
+Run with pytest, or directly: python scripts/test_cache_dedup.py"""
+import os, sys, shutil, tempfile
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import mega_download as m
+
+def test_cache_dedup_across_runs():
+    tmp = Path(tempfile.mkdtemp(prefix="cache_dedup_"))
+    try:
+        m.BASE_DIR, m.CACHE_FILE = tmp, tmp / ".download_cache.json"
+        original = tmp / "a.wav"
+        original.write_bytes(os.urandom(200_000))
+        copy = tmp / "b.wav"
+        shutil.copyfile(original, copy)
+        # Same size and first 64 KiB as the original, different tail
+        near = tmp / "c.wav"
+        data = original.read_bytes()
+        near.write_bytes(data[:-1] + bytes([data[-1] ^ 1]))
+
+        first = m.Cache()
+        assert not first.is_dup(original)
+        first.flush()
+
+        second = m.Cache()
+        assert second.is_dup(copy)
+        assert not second.is_dup(near)
+        assert second.is_dup(near)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_cache_dedup_across_runs()
+    print("ok")